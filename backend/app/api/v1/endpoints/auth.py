@@ -3,20 +3,32 @@ Authentication API endpoints
 User registration, login, and token management
 """
 
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from typing import Optional
-from datetime import datetime, timedelta
+from typing import Optional, Set
+from datetime import datetime, timezone
+from cachetools import TTLCache
 
-from app.models.user import UserCreate, UserLogin, Token, UserResponse
+from app.models.user import (
+    UserCreate,
+    UserLogin,
+    Token,
+    UserResponse,
+    UserRole,
+    CropType,
+    FarmerProfile,
+    FPOProfile
+)
 from app.core.security import (
     create_access_token,
     create_refresh_token,
     verify_password,
     get_password_hash,
-    decode_token
+    decode_token,
+    decode_refresh_token
 )
-from app.core.config import settings
+from app.core.config import settings, ACCESS_TOKEN_EXPIRE_SECONDS
 from app.core.database import get_collection
 from bson import ObjectId
 from loguru import logger
@@ -25,22 +37,47 @@ from loguru import logger
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+# Recently issued tokens per user, reused within the refresh cooldown window
+_recent_refresh: TTLCache = TTLCache(
+    maxsize=4096,
+    ttl=settings.REFRESH_COOLDOWN_SECONDS
+)
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+# Fire-and-forget writes, referenced until they complete
+_background_tasks: Set[asyncio.Task] = set()
+
+
+# Fields never returned by the current-user dependency
+USER_PROJECTION = {"hashed_password": 0}
+
+
+def _get_token_subject(token: str) -> ObjectId:
     """
-    Dependency to get current authenticated user
+    Decode a token and return its subject as a user ObjectId
     """
     payload = decode_token(token)
     user_id = payload.get("sub")
     
-    if user_id is None:
+    if user_id is None or not ObjectId.is_valid(user_id):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
     
+    return ObjectId(user_id)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Dependency to get current authenticated user
+    """
+    user_oid = _get_token_subject(token)
+    
     users_collection = get_collection("users")
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one(
+        {"_id": user_oid},
+        projection=USER_PROJECTION
+    )
     
     if user is None:
         raise HTTPException(
@@ -51,111 +88,148 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     return user
 
 
+def _to_user_response(user: dict) -> UserResponse:
+    """
+    Build a UserResponse from a trusted database document
+    Skips validation, since the document was written by this service
+    """
+    # model_construct keeps values as given; enum fields must hold enum
+    # members, or serializing the response warns on every request
+    fields = dict(user, id=str(user["_id"]))
+    if "role" in fields:
+        fields["role"] = UserRole(fields["role"])
+    
+    farmer_profile = fields.get("farmer_profile")
+    if farmer_profile is not None:
+        farmer_profile = dict(farmer_profile)
+        if "crops" in farmer_profile:
+            farmer_profile["crops"] = [CropType(crop) for crop in farmer_profile["crops"]]
+        fields["farmer_profile"] = FarmerProfile.model_construct(**farmer_profile)
+    
+    fpo_profile = fields.get("fpo_profile")
+    if fpo_profile is not None:
+        fpo_profile = dict(fpo_profile)
+        fpo_profile["primary_crops"] = [CropType(crop) for crop in fpo_profile["primary_crops"]]
+        fields["fpo_profile"] = FPOProfile.model_construct(**fpo_profile)
+    
+    return UserResponse.model_construct(**fields)
+
+
+def _login_query(username: str) -> dict:
+    """
+    Build a single-field lookup for a login username,
+    which is either an email address or a phone number
+    """
+    if "@" in username:
+        return {"email": username}
+    return {"phone": username}
+
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserCreate):
     """
     Register a new user (farmer or FPO)
     """
-    try:
-        users_collection = get_collection("users")
-        
-        # Check if user already exists
-        existing_user = await users_collection.find_one({
-            "$or": [
-                {"email": user_data.email},
-                {"phone": user_data.phone}
-            ]
-        })
-        
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User with this email or phone already exists"
-            )
-        
-        # Create user document
-        user_dict = user_data.dict(exclude={"password", "confirm_password"})
-        user_dict["hashed_password"] = get_password_hash(user_data.password)
-        user_dict["is_active"] = True
-        user_dict["is_verified"] = False
-        
-        # Insert user
-        result = await users_collection.insert_one(user_dict)
-        user_dict["_id"] = str(result.inserted_id)
-        
-        logger.info(f"✅ New user registered: {user_dict['phone']}")
-        
-        return UserResponse(**user_dict)
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"❌ Registration error: {str(e)}")
+    users_collection = get_collection("users")
+    
+    # Check if user already exists (one unique-index lookup per field)
+    existing_user = await users_collection.find_one(
+        {"phone": user_data.phone},
+        projection={"_id": 1}
+    )
+    if not existing_user and user_data.email:
+        existing_user = await users_collection.find_one(
+            {"email": user_data.email},
+            projection={"_id": 1}
+        )
+    
+    if existing_user:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Registration failed"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or phone already exists"
         )
+    
+    # Create user document
+    user_dict = user_data.dict(exclude={"password", "confirm_password"})
+    user_dict["hashed_password"] = await asyncio.to_thread(
+        get_password_hash, user_data.password
+    )
+    user_dict["is_active"] = True
+    user_dict["is_verified"] = False
+    user_dict["created_at"] = user_dict["updated_at"] = datetime.now(timezone.utc)
+    
+    # Insert user (the driver sets user_dict["_id"])
+    await users_collection.insert_one(user_dict)
+    
+    logger.info(f"✅ New user registered: {user_dict['phone']}")
+    
+    return _to_user_response(user_dict)
 
 
-@router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def _record_last_login(user_id: ObjectId, login_time: datetime):
     """
-    Login and receive access token
+    Persist a user's last login time
     """
     try:
         users_collection = get_collection("users")
-        
-        # Find user by email or phone
-        user = await users_collection.find_one({
-            "$or": [
-                {"email": form_data.username},
-                {"phone": form_data.username}
-            ]
-        })
-        
-        if not user or not verify_password(form_data.password, user["hashed_password"]):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-                headers={"WWW-Authenticate": "Bearer"}
-            )
-        
-        if not user.get("is_active", True):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Account is inactive"
-            )
-        
-        # Create tokens
-        access_token = create_access_token(
-            data={"sub": str(user["_id"]), "role": user["role"]}
-        )
-        refresh_token = create_refresh_token(
-            data={"sub": str(user["_id"])}
-        )
-        
-        # Update last login
         await users_collection.update_one(
-            {"_id": user["_id"]},
-            {"$set": {"last_login": datetime.utcnow()}}
-        )
-        
-        logger.info(f"✅ User logged in: {user['phone']}")
-        
-        return Token(
-            access_token=access_token,
-            refresh_token=refresh_token,
-            expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            {"_id": user_id},
+            {"$set": {"last_login": login_time}}
         )
-        
-    except HTTPException:
-        raise
+    
     except Exception as e:
-        logger.error(f"❌ Login error: {str(e)}")
+        logger.error(f"❌ Failed to record last login: {str(e)}")
+
+
+@router.post("/login", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+    """
+    Login and receive access token
+    """
+    users_collection = get_collection("users")
+    
+    # Find user by email or phone
+    user = await users_collection.find_one(_login_query(form_data.username))
+    
+    password_ok = user is not None and await asyncio.to_thread(
+        verify_password, form_data.password, user["hashed_password"]
+    )
+    
+    if not password_ok:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Login failed"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"}
         )
+    
+    if not user.get("is_active", True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Account is inactive"
+        )
+    
+    # Create tokens
+    access_token = create_access_token(
+        data={"sub": str(user["_id"]), "role": user["role"]}
+    )
+    refresh_token = create_refresh_token(
+        data={"sub": str(user["_id"])}
+    )
+    
+    # Update last login in the background; the response doesn't depend on it
+    task = asyncio.create_task(
+        _record_last_login(user["_id"], datetime.now(timezone.utc))
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    
+    logger.info(f"✅ User logged in: {user['phone']}")
+    
+    return Token(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        expires_in=ACCESS_TOKEN_EXPIRE_SECONDS
+    )
 
 
 @router.get("/me", response_model=UserResponse)
@@ -163,8 +237,21 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """
     Get current user profile
     """
-    current_user["_id"] = str(current_user["_id"])
-    return UserResponse(**current_user)
+    return _to_user_response(current_user)
+
+
+def _issue_tokens(user_id: str) -> Token:
+    """
+    Mint a new access/refresh token pair for a user
+    """
+    access_token = create_access_token(data={"sub": user_id})
+    new_refresh_token = create_refresh_token(data={"sub": user_id})
+    
+    return Token(
+        access_token=access_token,
+        refresh_token=new_refresh_token,
+        expires_in=ACCESS_TOKEN_EXPIRE_SECONDS
+    )
 
 
 @router.post("/refresh", response_model=Token)
@@ -172,30 +259,16 @@ async def refresh_token(refresh_token: str):
     """
     Refresh access token using refresh token
     """
-    try:
-        payload = decode_token(refresh_token)
-        
-        if payload.get("type") != "refresh":
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token type"
-            )
-        
-        user_id = payload.get("sub")
-        
-        # Create new tokens
-        access_token = create_access_token(data={"sub": user_id})
-        new_refresh_token = create_refresh_token(data={"sub": user_id})
-        
-        return Token(
-            access_token=access_token,
-            refresh_token=new_refresh_token,
-            expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-        )
-        
-    except Exception as e:
-        logger.error(f"❌ Token refresh error: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not refresh token"
-        )
+    payload = decode_refresh_token(refresh_token)
+    
+    user_id = payload.get("sub")
+    
+    # Reuse the tokens issued within the cooldown window
+    recent_token = _recent_refresh.get(user_id)
+    if recent_token is not None:
+        return recent_token
+    
+    token = _issue_tokens(user_id)
+    _recent_refresh[user_id] = token
+    
+    return token
@@ -3,7 +3,7 @@ Configuration settings for AgriHedge application
 Loads environment variables and provides application settings
 """
 
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import List, Optional
 from functools import lru_cache
 
@@ -11,6 +11,12 @@ from functools import lru_cache
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=True,
+        frozen=True
+    )
+    
     # Application
     APP_NAME: str = "AgriHedge"
     APP_VERSION: str = "1.0.0"
@@ -25,6 +31,10 @@ class Settings(BaseSettings):
     # Database
     MONGODB_URI: str = "mongodb://localhost:27017/agrihedge"
     DATABASE_NAME: str = "agrihedge"
+    MONGODB_MIN_POOL: int = 5
+    MONGODB_MAX_POOL: int = 50
+    MONGODB_COMPRESSORS: str = "zstd,zlib"
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 3000
     
     # Firebase (alternative)
     USE_FIREBASE: bool = False
@@ -35,6 +45,7 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    REFRESH_COOLDOWN_SECONDS: int = 5
     
     # CORS
     ALLOWED_ORIGINS: List[str] = [
@@ -77,11 +88,13 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 1.0
     
     # ML Model
     MODEL_RETRAIN_INTERVAL_DAYS: int = 7
     FORECAST_HORIZON_DAYS: int = 30
     CONFIDENCE_LEVEL: float = 0.95
+    MODEL_CACHE_DIR: str = "models/cache"
     
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -107,10 +120,6 @@ class Settings(BaseSettings):
     ADMIN_EMAIL: str = "admin@agrihedge.com"
     ADMIN_PASSWORD: str = "change-this-password"
     ADMIN_PHONE: str = "+919876543210"
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
 
 
 @lru_cache()
@@ -124,3 +133,7 @@ def get_settings() -> Settings:
 
 # Global settings instance
 settings = get_settings()
+
+# Hot-path values precomputed from the (immutable) settings
+ACCESS_TOKEN_EXPIRE_SECONDS = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_TOKEN_EXPIRE_SECONDS = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
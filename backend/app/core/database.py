@@ -2,8 +2,11 @@
 Database connection and management for MongoDB
 """
 
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+from redis.asyncio import Redis
+from typing import Dict, Optional
 from loguru import logger
 
 from app.core.config import settings
@@ -12,20 +15,59 @@ from app.core.config import settings
 class Database:
     """MongoDB database manager"""
     
-    client: Optional[AsyncIOMotorClient] = None
+    client: Optional[AsyncMongoClient] = None
+    database: Optional[AsyncDatabase] = None
+    collections: Dict[str, AsyncCollection] = {}
+    redis: Optional[Redis] = None
     
     
 db = Database()
 
+# Collections used by the application
+COLLECTION_NAMES = (
+    "users", "prices", "contracts", "forecasts", "blockchain", "alerts",
+    "settlement_events"
+)
+
+# Serves latest-price lookups ({commodity} sorted by date descending)
+PRICES_LATEST_INDEX = [("commodity", 1), ("date", -1)]
+
+# Settlement events expire (and are deleted) as soon as settle_at passes
+SETTLEMENT_EVENTS_TTL_INDEX = [("settle_at", 1)]
+
 
 async def connect_to_mongo():
     """Connect to MongoDB database"""
     try:
         logger.info("🔌 Connecting to MongoDB...")
-        db.client = AsyncIOMotorClient(settings.MONGODB_URI)
+        db.client = AsyncMongoClient(
+            settings.MONGODB_URI,
+            minPoolSize=settings.MONGODB_MIN_POOL,
+            maxPoolSize=settings.MONGODB_MAX_POOL,
+            compressors=settings.MONGODB_COMPRESSORS,
+            retryWrites=True,
+            serverSelectionTimeoutMS=settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS
+        )
         
         # Test connection
         await db.client.admin.command('ping')
+        
+        # Cache database and collection handles for request paths
+        db.database = db.client[settings.DATABASE_NAME]
+        db.collections = {
+            name: db.database[name]
+            for name in COLLECTION_NAMES
+        }
+        
+        # Latest-price queries run on every contract read; make sure they're indexed
+        await db.collections["prices"].create_index(PRICES_LATEST_INDEX)
+        
+        # Settlement is triggered by the TTL monitor deleting due events
+        await db.collections["settlement_events"].create_index(
+            SETTLEMENT_EVENTS_TTL_INDEX,
+            expireAfterSeconds=0
+        )
+        
         logger.info("✅ Connected to MongoDB successfully!")
         
     except Exception as e:
@@ -38,19 +80,65 @@ async def close_mongo_connection():
     try:
         logger.info("🔌 Closing MongoDB connection...")
         if db.client:
-            db.client.close()
+            await db.client.close()
         logger.info("✅ MongoDB connection closed!")
         
     except Exception as e:
         logger.error(f"❌ Error closing MongoDB connection: {str(e)}")
 
 
+async def connect_to_redis():
+    """
+    Connect to Redis
+    Redis only backs caches, so the app keeps running without it; short
+    socket timeouts make a hung Redis fail fast and fall back to MongoDB
+    """
+    client = Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        decode_responses=True
+    )
+    try:
+        logger.info("🔌 Connecting to Redis...")
+        await client.ping()
+        db.redis = client
+        logger.info("✅ Connected to Redis successfully!")
+    
+    except Exception as e:
+        logger.warning(f"⚠️ Redis unavailable, caching disabled: {str(e)}")
+        await client.aclose()
+
+
+async def close_redis_connection():
+    """Close Redis connection"""
+    try:
+        if db.redis:
+            await db.redis.aclose()
+            db.redis = None
+            logger.info("✅ Redis connection closed!")
+    
+    except Exception as e:
+        logger.error(f"❌ Error closing Redis connection: {str(e)}")
+
+
+def get_redis() -> Optional[Redis]:
+    """Get the Redis client, or None when Redis is unavailable"""
+    return db.redis
+
+
 def get_database():
     """Get database instance"""
-    return db.client[settings.DATABASE_NAME]
+    return db.database
 
 
 def get_collection(collection_name: str):
     """Get collection from database"""
-    database = get_database()
-    return database[collection_name]
+    collection = db.collections.get(collection_name)
+    if collection is None:
+        collection = db.database[collection_name]
+        db.collections[collection_name] = collection
+    return collection
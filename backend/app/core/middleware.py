@@ -0,0 +1,147 @@
+"""
+ASGI middleware for request timing, logging and CORS
+"""
+
+import time
+from typing import Dict, List, Tuple
+from loguru import logger
+
+
+# Liveness/root paths served without timing or logging
+EXCLUDED_PATHS = frozenset({"/health", "/"})
+
+
+class ProcessTimeMiddleware:
+    """
+    Log requests and add an X-Process-Time header to responses
+    Plain ASGI middleware, avoiding the extra task BaseHTTPMiddleware creates per request
+    """
+    
+    def __init__(self, app, excluded_paths: frozenset = EXCLUDED_PATHS):
+        self.app = app
+        self.excluded_paths = excluded_paths
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            return await self.app(scope, receive, send)
+        
+        start = time.perf_counter_ns()
+        method = scope["method"]
+        path = scope["path"]
+        status_code = None
+        
+        # Log request
+        logger.info("{} {}", method, path)
+        
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                process_time = (time.perf_counter_ns() - start) / 1e9
+                headers = list(message.get("headers", []))
+                headers.append((b"x-process-time", str(process_time).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        await self.app(scope, receive, send_with_timing)
+        elapsed_ns = time.perf_counter_ns() - start
+        
+        # Log response
+        logger.info(
+            "{} {} -> {} in {:.3f}ms",
+            method, path, status_code, elapsed_ns / 1e6
+        )
+
+
+# Methods allowed on cross-origin requests (equivalent to allow_methods=["*"])
+CORS_ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+CORS_MAX_AGE = b"600"
+
+# Body of the 400 sent to preflights from unlisted origins, as CORSMiddleware does
+CORS_DISALLOWED_ORIGIN = b"Disallowed CORS origin"
+
+
+class StaticCORSMiddleware:
+    """
+    CORS for a fixed list of origins using pre-rendered header blocks
+    Preflight requests are answered without reaching the router
+    """
+    
+    def __init__(self, app, allow_origins: List[str]):
+        self.app = app
+        
+        # Response headers per allowed origin, rendered once
+        self.simple_headers: Dict[bytes, List[Tuple[bytes, bytes]]] = {
+            origin.encode("latin-1"): [
+                (b"access-control-allow-origin", origin.encode("latin-1")),
+                (b"access-control-allow-credentials", b"true"),
+                (b"vary", b"Origin"),
+            ]
+            for origin in allow_origins
+        }
+        self.preflight_headers: Dict[bytes, List[Tuple[bytes, bytes]]] = {
+            origin: headers + [
+                (b"access-control-allow-methods", CORS_ALLOW_METHODS),
+                (b"access-control-max-age", CORS_MAX_AGE),
+            ]
+            for origin, headers in self.simple_headers.items()
+        }
+        self.rejected_preflight_headers: List[Tuple[bytes, bytes]] = [
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+            (b"access-control-allow-methods", CORS_ALLOW_METHODS),
+            (b"access-control-max-age", CORS_MAX_AGE),
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(CORS_DISALLOWED_ORIGIN)).encode()),
+        ]
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        origin = None
+        request_method = None
+        request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+        
+        if origin is None:
+            return await self.app(scope, receive, send)
+        
+        cors_headers = self.simple_headers.get(origin)
+        is_preflight = scope["method"] == "OPTIONS" and request_method is not None
+        if cors_headers is None:
+            if not is_preflight:
+                return await self.app(scope, receive, send)
+            
+            # Reject preflight requests from unlisted origins
+            await send({
+                "type": "http.response.start",
+                "status": 400,
+                "headers": self.rejected_preflight_headers
+            })
+            await send({"type": "http.response.body", "body": CORS_DISALLOWED_ORIGIN})
+            return
+        
+        # Answer preflight requests directly
+        if is_preflight:
+            headers = list(self.preflight_headers[origin])
+            if request_headers is not None:
+                headers.append((b"access-control-allow-headers", request_headers))
+            await send({"type": "http.response.start", "status": 204, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.extend(cors_headers)
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        await self.app(scope, receive, send_with_cors)
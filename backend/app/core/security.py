@@ -3,18 +3,66 @@ Security utilities for authentication and authorization
 JWT token handling and password hashing
 """
 
-from datetime import datetime, timedelta
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import time
+import orjson
+from datetime import timedelta
 from typing import Optional, Dict, Any
+from cachetools import TTLCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 
-from app.core.config import settings
+from app.core.config import (
+    settings,
+    ACCESS_TOKEN_EXPIRE_SECONDS,
+    REFRESH_TOKEN_EXPIRE_SECONDS
+)
 
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Verified token payloads, so repeat requests with the same token skip
+# signature verification (payloads are shared and must not be mutated)
+_decoded_tokens: TTLCache = TTLCache(maxsize=4096, ttl=60)
+
+
+def _b64url(data: bytes) -> bytes:
+    """Base64url-encode without padding, as used by JWT"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+# HS256 signing state: pre-encoded header and a keyed HMAC to copy per token
+_ENCODED_HEADER = _b64url(b'{"alg":"HS256","typ":"JWT"}')
+_HMAC_PROTO = hmac.new(settings.SECRET_KEY.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def _encode_jwt(claims: Dict[str, Any]) -> str:
+    """
+    Sign JWT claims with the configured key
+    HS256 tokens are signed from the cached HMAC state; other algorithms use python-jose
+    
+    Args:
+        claims: JSON-serializable claims (exp as a UTC timestamp)
+    
+    Returns:
+        Encoded JWT token
+    """
+    if settings.ALGORITHM != "HS256":
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    
+    signing_input = _ENCODED_HEADER + b"." + _b64url(orjson.dumps(claims))
+    
+    signer = _HMAC_PROTO.copy()
+    signer.update(signing_input)
+    
+    return (signing_input + b"." + _b64url(signer.digest())).decode("ascii")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -54,15 +102,13 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     Returns:
         Encoded JWT token
     """
-    to_encode = data.copy()
-    
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time() + expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = int(time.time()) + ACCESS_TOKEN_EXPIRE_SECONDS
     
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    to_encode = {**data, "exp": expire, "type": "access"}
+    encoded_jwt = _encode_jwt(to_encode)
     
     return encoded_jwt
 
@@ -77,11 +123,10 @@ def create_refresh_token(data: Dict[str, Any]) -> str:
     Returns:
         Encoded JWT refresh token
     """
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    expire = int(time.time()) + REFRESH_TOKEN_EXPIRE_SECONDS
     
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    to_encode = {**data, "exp": expire, "type": "refresh"}
+    encoded_jwt = _encode_jwt(to_encode)
     
     return encoded_jwt
 
@@ -99,9 +144,12 @@ def decode_token(token: str) -> Dict[str, Any]:
     Raises:
         HTTPException: If token is invalid or expired
     """
+    payload = _decoded_tokens.get(token)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
         
     except JWTError as e:
         raise HTTPException(
@@ -109,6 +157,76 @@ def decode_token(token: str) -> Dict[str, Any]:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    _decoded_tokens[token] = payload
+    return payload
+
+
+# Refresh-token decoder bound to the configured key and algorithm
+_decode_refresh = functools.partial(
+    jwt.decode,
+    key=settings.SECRET_KEY,
+    algorithms=[settings.ALGORITHM],
+    options={"require_sub": True, "require_exp": True}
+)
+
+
+def _peek_token_type(token: str) -> Optional[str]:
+    """
+    Read the unverified "type" claim of a JWT without checking its signature
+    
+    Args:
+        token: JWT token
+    
+    Returns:
+        Token type claim, or None if the token is malformed
+    """
+    try:
+        segment = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+        return claims.get("type")
+    
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+def decode_refresh_token(token: str) -> Dict[str, Any]:
+    """
+    Decode and verify a JWT refresh token
+    Tokens that don't claim to be refresh tokens are rejected before signature verification
+    
+    Args:
+        token: JWT refresh token to decode
+    
+    Returns:
+        Decoded token payload
+    
+    Raises:
+        HTTPException: If token is not a valid refresh token
+    """
+    if _peek_token_type(token) != "refresh":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type"
+        )
+    
+    try:
+        payload = _decode_refresh(token)
+    
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if payload.get("type") != "refresh":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token type"
+        )
+    
+    return payload
 
 
 def verify_token_type(payload: Dict[str, Any], expected_type: str) -> bool:
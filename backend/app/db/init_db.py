@@ -4,36 +4,52 @@ Run this to create initial data and indexes
 """
 
 import asyncio
-from datetime import datetime, timedelta
-import random
+from datetime import datetime, time, timedelta, timezone
+import numpy as np
 from loguru import logger
+from pymongo import UpdateOne
 
-from app.core.database import connect_to_mongo, get_collection
+from app.core.database import (
+    connect_to_mongo,
+    get_collection,
+    PRICES_LATEST_INDEX,
+    SETTLEMENT_EVENTS_TTL_INDEX
+)
 from app.core.security import get_password_hash
 from app.core.config import settings
 
 
-async def create_indexes():
-    """Create database indexes"""
-    logger.info("📊 Creating database indexes...")
-    
+# Index plan: (collection name, key spec, index options)
+INDEX_SPECS = [
     # Users collection indexes
-    users = get_collection("users")
-    await users.create_index("email", unique=True, sparse=True)
-    await users.create_index("phone", unique=True)
-    await users.create_index("role")
+    ("users", "email", {"unique": True, "sparse": True}),
+    ("users", "phone", {"unique": True}),
+    ("users", "role", {}),
     
     # Prices collection indexes
-    prices = get_collection("prices")
-    await prices.create_index([("commodity", 1), ("date", -1)])
-    await prices.create_index("date")
+    ("prices", PRICES_LATEST_INDEX, {}),
+    ("prices", "date", {}),
     
     # Contracts collection indexes
-    contracts = get_collection("contracts")
-    await contracts.create_index("user_id")
-    await contracts.create_index("status")
-    await contracts.create_index("settlement_date")
-    await contracts.create_index([("user_id", 1), ("status", 1)])
+    ("contracts", "user_id", {}),
+    ("contracts", "status", {}),
+    ("contracts", "settlement_date", {}),
+    ("contracts", [("user_id", 1), ("status", 1)], {}),
+    
+    # Settlement events collection indexes
+    ("settlement_events", SETTLEMENT_EVENTS_TTL_INDEX, {"expireAfterSeconds": 0}),
+]
+
+
+async def create_indexes():
+    """Create database indexes"""
+    logger.info("📊 Creating database indexes...")
+    
+    # Issue all index builds concurrently, without blocking collection writes
+    await asyncio.gather(*[
+        get_collection(collection_name).create_index(keys, background=True, **options)
+        for collection_name, keys, options in INDEX_SPECS
+    ])
     
     logger.info("✅ Indexes created")
 
@@ -43,6 +59,7 @@ async def create_admin_user():
     logger.info("👤 Creating admin user...")
     
     users = get_collection("users")
+    now = datetime.now(timezone.utc)
     
     # Check if admin exists
     existing_admin = await users.find_one({"email": settings.ADMIN_EMAIL})
@@ -59,8 +76,8 @@ async def create_admin_user():
         "hashed_password": get_password_hash(settings.ADMIN_PASSWORD),
         "is_active": True,
         "is_verified": True,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "created_at": now,
+        "updated_at": now
     }
     
     await users.insert_one(admin_user)
@@ -90,30 +107,36 @@ async def seed_price_data():
     }
     
     # Generate 90 days of historical data
-    today = datetime.utcnow().date()
+    days = 90
+    now = datetime.now(timezone.utc)
+    # BSON has no date type; store each day as midnight UTC
+    today = datetime.combine(now.date(), time.min, tzinfo=timezone.utc)
+    dates = [today - timedelta(days=i) for i in range(days, 0, -1)]
+    rng = np.random.default_rng()
     price_data = []
     
     for commodity in commodities:
         base_price = base_prices[commodity]
         
-        for i in range(90, 0, -1):
-            date = today - timedelta(days=i)
-            
-            # Add some random variation
-            variation = random.uniform(-0.05, 0.05)
-            price = base_price * (1 + variation)
-            
-            price_data.append({
+        # Generate the whole series at once with random variation
+        variations = rng.uniform(-0.05, 0.05, size=days)
+        prices_series = np.round(base_price * (1 + variations), 2).tolist()
+        volumes = np.round(rng.uniform(500, 2000, size=days), 2).tolist()
+        
+        price_data.extend(
+            {
                 "date": date,
-                "price": round(price, 2),
+                "price": price,
                 "commodity": commodity,
                 "market": "Sample Mandi",
                 "market_type": "mandi",
-                "volume": round(random.uniform(500, 2000), 2),
-                "created_at": datetime.utcnow()
-            })
+                "volume": volume,
+                "created_at": now
+            }
+            for date, price, volume in zip(dates, prices_series, volumes)
+        )
     
-    await prices.insert_many(price_data)
+    await prices.insert_many(price_data, ordered=False)
     logger.info(f"✅ Seeded {len(price_data)} price records")
 
 
@@ -122,6 +145,7 @@ async def seed_sample_users():
     logger.info("👥 Creating sample users...")
     
     users = get_collection("users")
+    now = datetime.now(timezone.utc)
     
     sample_users = [
         {
@@ -142,8 +166,8 @@ async def seed_sample_users():
             },
             "is_active": True,
             "is_verified": True,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "created_at": now,
+            "updated_at": now
         },
         {
             "email": "fpo1@example.com",
@@ -163,16 +187,17 @@ async def seed_sample_users():
             },
             "is_active": True,
             "is_verified": True,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "created_at": now,
+            "updated_at": now
         }
     ]
     
-    for user in sample_users:
-        existing = await users.find_one({"phone": user["phone"]})
-        if not existing:
-            await users.insert_one(user)
-            logger.info(f"   Created user: {user['full_name']}")
+    # Insert users that don't exist yet in a single round trip
+    result = await users.bulk_write([
+        UpdateOne({"phone": user["phone"]}, {"$setOnInsert": user}, upsert=True)
+        for user in sample_users
+    ], ordered=False)
+    logger.info(f"   Created {result.upserted_count} users")
     
     logger.info("✅ Sample users created")
 
@@ -184,9 +209,13 @@ async def main():
     await connect_to_mongo()
     
     await create_indexes()
-    await create_admin_user()
-    await seed_price_data()
-    await seed_sample_users()
+    
+    # Seed steps are independent of each other
+    await asyncio.gather(
+        create_admin_user(),
+        seed_price_data(),
+        seed_sample_users()
+    )
     
     logger.info("✅ Database initialization complete!")
     logger.info("")
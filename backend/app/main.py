@@ -5,17 +5,43 @@ Mobile-first, blockchain-enabled, AI-driven price hedging simulation platform
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
-import time
+from pymongo.errors import PyMongoError
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import sys
 from loguru import logger
 
 from app.core.config import settings
-from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.database import (
+    connect_to_mongo,
+    close_mongo_connection,
+    connect_to_redis,
+    close_redis_connection
+)
+from app.core.middleware import ProcessTimeMiddleware, StaticCORSMiddleware
+from app.ml.forecaster_kernels import warm_up
 from app.api.v1 import api_router
 from app.services.scheduler import start_scheduler, stop_scheduler
 
 
+def configure_logging():
+    """
+    Configure the log sink once at startup
+    Records below LOG_LEVEL are dropped and sink IO runs off the request path
+    """
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=settings.LOG_LEVEL,
+        enqueue=True,
+        backtrace=False,
+        diagnose=False
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -23,8 +49,19 @@ async def lifespan(app: FastAPI):
     Handles startup and shutdown events
     """
     # Startup
+    configure_logging()
     logger.info("🚀 Starting AgriHedge API Server...")
+    
+    # Size the default executor used for blocking work (e.g. bcrypt)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2)
+    )
     await connect_to_mongo()
+    await connect_to_redis()
+    
+    # Compile (or load cached) Numba kernels off the event loop, so the
+    # first forecast or retraining run doesn't pay the JIT latency
+    await asyncio.to_thread(warm_up)
     start_scheduler()
     logger.info("✅ AgriHedge API Server started successfully!")
     
@@ -32,9 +69,13 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Shutting down AgriHedge API Server...")
-    stop_scheduler()
+    await stop_scheduler()
+    await close_redis_connection()
     await close_mongo_connection()
     logger.info("✅ AgriHedge API Server stopped successfully!")
+    
+    # Flush records still queued for the sink
+    await logger.complete()
 
 
 # Initialize FastAPI app
@@ -44,43 +85,26 @@ app = FastAPI(
     version=settings.APP_VERSION,
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Configure CORS (static origins use pre-rendered headers;
+# wildcard origins fall back to Starlette's middleware)
+if "*" in settings.ALLOWED_ORIGINS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.ALLOWED_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+else:
+    app.add_middleware(StaticCORSMiddleware, allow_origins=settings.ALLOWED_ORIGINS)
 
 
-# Middleware for request logging and timing
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all incoming requests and response times"""
-    start_time = time.time()
-    
-    # Log request
-    logger.info(f"📨 {request.method} {request.url.path}")
-    
-    # Process request
-    response = await call_next(request)
-    
-    # Calculate processing time
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    
-    # Log response
-    logger.info(
-        f"✅ {request.method} {request.url.path} - "
-        f"Status: {response.status_code} - "
-        f"Time: {process_time:.3f}s"
-    )
-    
-    return response
+# Request logging and timing
+app.add_middleware(ProcessTimeMiddleware)
 
 
 # Include API routes
@@ -116,6 +140,22 @@ async def root():
     }
 
 
+# Database error handler
+@app.exception_handler(PyMongoError)
+async def database_exception_handler(request: Request, exc: PyMongoError):
+    """
+    Log database errors raised by any endpoint and return a 500
+    """
+    logger.error(f"❌ Database error on {request.method} {request.url.path}: {str(exc)}")
+    return ORJSONResponse(
+        status_code=500,
+        content={
+            "detail": "Database error",
+            "message": str(exc) if settings.DEBUG else "An error occurred"
+        }
+    )
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -123,7 +163,7 @@ async def global_exception_handler(request: Request, exc: Exception):
     Global exception handler for unhandled errors
     """
     logger.error(f"❌ Unhandled exception: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": "Internal server error",
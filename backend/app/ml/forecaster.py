@@ -3,17 +3,39 @@ AI/ML Price Forecasting Module
 Uses ARIMA and Linear Regression for oilseed price prediction
 """
 
+import hashlib
+import multiprocessing
+import os
+import threading
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from typing import List, Dict, Tuple, Optional
 from statsmodels.tsa.arima.model import ARIMA
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
 import joblib
+import statsmodels
 from loguru import logger
 
 from app.core.config import settings
+from app.ml.forecaster_kernels import (
+    ffill_inplace,
+    rolling_mean,
+    rolling_std,
+    volatility_stats
+)
+
+
+# Prepared feature frames kept per forecaster, most recently used last
+PREPARED_CACHE_SIZE = 8
+
+# Bump when the cached fit format or training code changes; part of every
+# model cache key along with the statsmodels version
+MODEL_CACHE_VERSION = 1
 
 
 class PriceForecaster:
@@ -33,37 +55,183 @@ class PriceForecaster:
         self.model = None
         self.scaler = StandardScaler()
         self.last_trained = None
+        self._prepared: "OrderedDict[bytes, pd.DataFrame]" = OrderedDict()
+        # Guards _prepared; forecasters are shared across request threads
+        self._prepared_lock = threading.Lock()
+        
+    def _history_arrays(self, price_history: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Unpack price records into parallel arrays, in input order
+        
+        Args:
+            price_history: List of price records with date and price
+        
+        Returns:
+            Tuple of (datetime64[s] dates, float64 prices); missing prices are NaN
+        """
+        count = len(price_history)
+        try:
+            dates = np.fromiter(
+                (p['date'] for p in price_history), dtype='datetime64[s]', count=count
+            )
+        except (TypeError, ValueError):
+            # Non-ISO date strings go through the pandas parser
+            dates = pd.to_datetime([p['date'] for p in price_history]).values.astype('datetime64[s]')
+        prices = np.fromiter(
+            (p.get('price') for p in price_history), dtype=np.float64, count=count
+        )
         
+        return dates, prices
+    
+    def prepare_price_series(self, price_history: List[Dict]) -> np.ndarray:
+        """
+        Extract the date-ordered price series for the univariate ARIMA fit
+        
+        Args:
+            price_history: List of price records with date and price
+        
+        Returns:
+            Prices (float64) sorted by date, with missing prices filled
+        """
+        return self._price_series(*self._history_arrays(price_history))
+    
+    def _price_series(self, dates: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """
+        Sort parsed prices by date and fill missing ones
+        
+        Args:
+            dates: Record dates (datetime64), in input order
+            prices: Record prices (float64), in input order
+        
+        Returns:
+            Prices (float64) sorted by date, with missing prices filled
+        """
+        # Fancy indexing copies, so the fill never touches the caller's data
+        prices = prices[np.argsort(dates, kind='stable')]
+        ffill_inplace(prices)
+        
+        return prices
+    
     def prepare_data(self, price_history: List[Dict]) -> pd.DataFrame:
         """
-        Prepare historical price data for modeling
+        Prepare historical price data with calendar and rolling features
+        Recently prepared histories are served from a small LRU cache,
+        so the returned frame is shared and must not be modified
         
         Args:
             price_history: List of price records with date and price
+        
+        Returns:
+            Prepared DataFrame with processed features
+        """
+        return self._prepared_frame(*self._history_arrays(price_history))
+    
+    def _prepared_frame(self, dates: np.ndarray, prices: np.ndarray) -> pd.DataFrame:
+        """
+        Look up or build the feature frame for parsed history arrays
+        
+        Args:
+            dates: Record dates (datetime64), in input order
+            prices: Record prices (float64), in input order
+        
+        Returns:
+            Prepared DataFrame with processed features (shared, read-only)
+        """
+        key = hashlib.blake2b(dates.tobytes() + prices.tobytes(), digest_size=16).digest()
+        
+        with self._prepared_lock:
+            df = self._prepared.get(key)
+            if df is not None:
+                self._prepared.move_to_end(key)
+                return df
+        
+        # Built outside the lock; a concurrent miss on the same key just
+        # builds an identical frame
+        df = self._build_feature_frame(dates, prices)
+        
+        with self._prepared_lock:
+            self._prepared[key] = df
+            if len(self._prepared) > PREPARED_CACHE_SIZE:
+                self._prepared.popitem(last=False)
+        
+        return df
+    
+    def _build_feature_frame(self, dates: np.ndarray, prices: np.ndarray) -> pd.DataFrame:
+        """
+        Build the date-indexed feature DataFrame for a price history
+        
+        Args:
+            dates: Record dates (datetime64), in input order
+            prices: Record prices (float64), in input order
             
         Returns:
             Prepared DataFrame with processed features
         """
-        df = pd.DataFrame(price_history)
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values('date')
-        df.set_index('date', inplace=True)
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
         
-        # Add time-based features
-        df['day_of_week'] = df.index.dayofweek
-        df['month'] = df.index.month
-        df['day_of_year'] = df.index.dayofyear
+        # Feature prices are float32, which is ample for INR/quintal and
+        # halves memory traffic (the ARIMA fit stays float64). Missing
+        # prices are filled in place (forward, and backward for leading
+        # gaps), since the rolling kernels assume NaN-free input
+        prices = prices[order].astype(np.float32)
+        ffill_inplace(prices)
         
-        # Add rolling statistics
-        df['rolling_mean_7'] = df['price'].rolling(window=7).mean()
-        df['rolling_std_7'] = df['price'].rolling(window=7).std()
-        df['rolling_mean_30'] = df['price'].rolling(window=30).mean()
+        # Index directly from the datetime64 array, without re-parsing
+        df = pd.DataFrame(
+            {'price': prices},
+            index=pd.DatetimeIndex(dates.astype('datetime64[ns]'), name='date')
+        )
         
-        # Forward fill missing values
-        df = df.fillna(method='ffill')
+        # Add time-based features from datetime64 day arithmetic
+        days = dates.astype('datetime64[D]')
+        day_numbers = days.astype(np.int64)
+        # 1970-01-01 was a Thursday (Monday is 0)
+        df['day_of_week'] = ((day_numbers + 3) % 7).astype(np.int8)
+        df['month'] = (days.astype('datetime64[M]').astype(np.int64) % 12 + 1).astype(np.int8)
+        year_start = days.astype('datetime64[Y]').astype('datetime64[D]')
+        df['day_of_year'] = ((days - year_start).astype(np.int64) + 1).astype(np.int16)
+        
+        # Add rolling statistics
+        df['rolling_mean_7'] = rolling_mean(prices, 7)
+        df['rolling_std_7'] = rolling_std(prices, 7)
+        df['rolling_mean_30'] = rolling_mean(prices, 30)
         
         return df
     
+    def _model_cache_path(self, prices: np.ndarray, order: Tuple[int, int, int]) -> Path:
+        """
+        Content-addressed cache file for an ARIMA fit on the given prices
+        
+        Args:
+            prices: Price series the model is fitted on (float64)
+            order: ARIMA order (p, d, q)
+        
+        Returns:
+            Path of the cached fit under settings.MODEL_CACHE_DIR,
+            named {commodity}-{key}.joblib
+        """
+        version = f"{MODEL_CACHE_VERSION}:{statsmodels.__version__}"
+        key = hashlib.blake2b(
+            prices.tobytes()
+            + repr(tuple(order)).encode()
+            + self.commodity.encode()
+            + version.encode(),
+            digest_size=16
+        ).hexdigest()
+        return Path(settings.MODEL_CACHE_DIR) / f"{self.commodity}-{key}.joblib"
+    
+    def _prune_model_cache(self, keep: Path):
+        """
+        Delete this commodity's cached fits other than the given one
+        
+        Args:
+            keep: Cache file to keep
+        """
+        for path in keep.parent.glob(f"{self.commodity}-*.joblib"):
+            if path != keep:
+                path.unlink(missing_ok=True)
+    
     def train_arima_model(
         self,
         price_history: List[Dict],
@@ -71,6 +239,7 @@ class PriceForecaster:
     ) -> Dict:
         """
         Train ARIMA model on historical price data
+        Reuses a cached fit when the same prices and order were trained before
         
         Args:
             price_history: Historical price data
@@ -80,31 +249,64 @@ class PriceForecaster:
             Training metrics and model info
         """
         try:
-            df = self.prepare_data(price_history)
+            prices = self.prepare_price_series(price_history)
+            
+            # Reuse a previous fit on identical inputs
+            cache_path = self._model_cache_path(prices, order)
+            if cache_path.exists():
+                try:
+                    cached = joblib.load(cache_path)
+                    self.model = cached['model']
+                    self.last_trained = cached['trained_at']
+                    logger.info(f"✅ Loaded cached ARIMA model for {self.commodity}")
+                    return cached['metrics']
+                except Exception as e:
+                    logger.warning(f"⚠️ Ignoring unreadable model cache {cache_path}: {str(e)}")
             
             # Train ARIMA model
             logger.info(f"Training ARIMA model for {self.commodity}...")
-            model = ARIMA(df['price'], order=order)
+            model = ARIMA(prices, order=order)
             self.model = model.fit()
             self.last_trained = datetime.utcnow()
             
-            # Calculate metrics
-            predictions = self.model.predict(start=0, end=len(df)-1)
-            mse = np.mean((df['price'] - predictions) ** 2)
+            # Calculate metrics from the in-sample one-step-ahead residuals,
+            # skipping any point the fit could not score
+            resid = np.asarray(self.model.resid)
+            mse = np.nanmean(resid * resid)
             rmse = np.sqrt(mse)
-            mape = np.mean(np.abs((df['price'] - predictions) / df['price'])) * 100
+            mape = np.nanmean(np.abs(resid / prices)) * 100
             
             logger.info(f"✅ ARIMA model trained - RMSE: {rmse:.2f}, MAPE: {mape:.2f}%")
             
-            return {
+            metrics = {
                 "model_type": "ARIMA",
                 "order": order,
                 "rmse": float(rmse),
                 "mape": float(mape),
                 "trained_at": self.last_trained.isoformat(),
-                "data_points": len(df)
+                "data_points": len(prices)
             }
             
+            # A fit whose metrics are not finite is not worth reusing
+            if not (np.isfinite(rmse) and np.isfinite(mape)):
+                logger.warning(f"⚠️ Not caching ARIMA model for {self.commodity}: non-finite metrics")
+                return metrics
+            
+            # Cache the fit so unchanged inputs skip retraining; only the
+            # newest fit per commodity is kept
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                joblib.dump({
+                    'model': self.model,
+                    'trained_at': self.last_trained,
+                    'metrics': metrics
+                }, cache_path)
+                self._prune_model_cache(cache_path)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not cache ARIMA model: {str(e)}")
+            
+            return metrics
+            
         except Exception as e:
             logger.error(f"❌ Error training ARIMA model: {str(e)}")
             raise
@@ -130,32 +332,41 @@ class PriceForecaster:
             
             # Generate forecast
             logger.info(f"Generating {steps}-day forecast for {self.commodity}...")
-            forecast_result = self.model.forecast(steps=steps)
+            forecast_result = self.model.get_forecast(steps=steps)
+            predicted = np.asarray(forecast_result.predicted_mean)
             
             # Get confidence intervals
-            forecast_df = self.model.get_forecast(steps=steps)
-            confidence_intervals = forecast_df.conf_int(alpha=1-confidence_level)
+            confidence_intervals = np.asarray(
+                forecast_result.conf_int(alpha=1-confidence_level)
+            )
             
             # Prepare response
-            today = datetime.utcnow().date()
-            forecasts = []
+            now = datetime.utcnow()
+            today = np.datetime64(now.date(), 'D')
+            dates = (today + np.arange(1, steps + 1, dtype='timedelta64[D]')).astype(str).tolist()
             
-            for i in range(steps):
-                forecast_date = today + timedelta(days=i+1)
-                forecasts.append({
-                    "date": forecast_date.isoformat(),
-                    "predicted_price": float(forecast_result.iloc[i]),
-                    "lower_bound": float(confidence_intervals.iloc[i, 0]),
-                    "upper_bound": float(confidence_intervals.iloc[i, 1]),
+            forecasts = [
+                {
+                    "date": forecast_date,
+                    "predicted_price": price,
+                    "lower_bound": lower,
+                    "upper_bound": upper,
                     "confidence_level": confidence_level
-                })
+                }
+                for forecast_date, price, lower, upper in zip(
+                    dates,
+                    predicted.tolist(),
+                    confidence_intervals[:, 0].tolist(),
+                    confidence_intervals[:, 1].tolist()
+                )
+            ]
             
             logger.info(f"✅ Forecast generated successfully")
             
             return {
                 "commodity": self.commodity,
                 "forecast_horizon_days": steps,
-                "generated_at": datetime.utcnow().isoformat(),
+                "generated_at": now.isoformat(),
                 "forecasts": forecasts,
                 "model_info": {
                     "type": "ARIMA",
@@ -183,18 +394,18 @@ class PriceForecaster:
             Volatility metrics and alerts
         """
         try:
-            df = self.prepare_data(price_history)
+            # Parse the history once for both the features and the price
+            dates, history = self._history_arrays(price_history)
+            df = self._prepared_frame(dates, history)
             
-            # Calculate rolling volatility
-            df['returns'] = df['price'].pct_change()
-            df['volatility'] = df['returns'].rolling(window=window).std() * np.sqrt(252)
+            prices = df['price'].to_numpy()
             
-            current_volatility = df['volatility'].iloc[-1]
-            avg_volatility = df['volatility'].mean()
+            # Calculate rolling volatility and the recent trend (float32)
+            current_volatility, avg_volatility, trend_slope = volatility_stats(prices, window)
             
-            # Detect trend
-            recent_prices = df['price'].tail(window).values
-            trend_slope = np.polyfit(range(len(recent_prices)), recent_prices, 1)[0]
+            # Report the latest known price at full precision (float64)
+            series = self._price_series(dates, history)
+            current_price = float(series[-1]) if series.size else float('nan')
             
             # Determine alert level
             alert_level = "normal"
@@ -205,7 +416,7 @@ class PriceForecaster:
             
             return {
                 "commodity": self.commodity,
-                "current_price": float(df['price'].iloc[-1]),
+                "current_price": current_price,
                 "current_volatility": float(current_volatility),
                 "average_volatility": float(avg_volatility),
                 "trend": "upward" if trend_slope > 0 else "downward",
@@ -239,6 +450,7 @@ class PriceForecaster:
 
 # Singleton forecaster instances
 _forecasters = {}
+_forecasters_lock = threading.Lock()
 
 
 def get_forecaster(commodity: str) -> PriceForecaster:
@@ -251,6 +463,71 @@ def get_forecaster(commodity: str) -> PriceForecaster:
     Returns:
         PriceForecaster instance
     """
-    if commodity not in _forecasters:
-        _forecasters[commodity] = PriceForecaster(commodity)
-    return _forecasters[commodity]
+    # Lock-free fast path; dict reads are atomic
+    forecaster = _forecasters.get(commodity)
+    if forecaster is not None:
+        return forecaster
+    
+    with _forecasters_lock:
+        if commodity not in _forecasters:
+            _forecasters[commodity] = PriceForecaster(commodity)
+        return _forecasters[commodity]
+
+
+def fit_forecaster(commodity: str, price_history: List[Dict]) -> Tuple[Dict, object, datetime]:
+    """
+    Train a fresh forecaster for one commodity
+    Module-level so it can run in a worker process
+    
+    Args:
+        commodity: Commodity name
+        price_history: Historical price data
+    
+    Returns:
+        Tuple of (training metrics, fitted model, training time)
+    """
+    forecaster = PriceForecaster(commodity)
+    metrics = forecaster.train_arima_model(price_history)
+    return metrics, forecaster.model, forecaster.last_trained
+
+
+def train_all(histories: Dict[str, List[Dict]]) -> Dict[str, Dict]:
+    """
+    Train ARIMA models for several commodities in parallel processes
+    and install the fitted models on the shared forecasters
+    
+    Args:
+        histories: Price history per commodity
+    
+    Returns:
+        Training metrics per commodity (failed commodities are omitted)
+    """
+    if not histories:
+        return {}
+    
+    results = {}
+    max_workers = min(len(histories), os.cpu_count() or 1)
+    
+    # Spawn rather than fork: the server process already runs threads
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = {
+            commodity: pool.submit(fit_forecaster, commodity, price_history)
+            for commodity, price_history in histories.items()
+        }
+        
+        for commodity, future in futures.items():
+            try:
+                metrics, model, last_trained = future.result()
+            except Exception as e:
+                logger.error(f"❌ Error training model for {commodity}: {str(e)}")
+                continue
+            
+            forecaster = get_forecaster(commodity)
+            forecaster.model = model
+            forecaster.last_trained = last_trained
+            results[commodity] = metrics
+    
+    return results
@@ -0,0 +1,183 @@
+"""
+Numba kernels for the price forecaster
+Single-pass rolling-window statistics over 1-D float32/float64 price arrays
+Outputs keep the input dtype; sums are always accumulated in float64
+"""
+
+import math
+import numpy as np
+from numba import njit
+
+
+# Trading days per year, used to annualise daily return volatility
+TRADING_DAYS = 252.0
+
+
+@njit(cache=True)
+def ffill_inplace(a: np.ndarray):
+    """
+    Forward-fill NaNs in place; leading NaNs are back-filled from the
+    first known value, so the fastmath kernels below never see a NaN
+    unless every value is missing (compiled without fastmath, which
+    would assume no NaNs)
+    
+    Args:
+        a: Float array to fill
+    """
+    n = a.shape[0]
+    first = 0
+    while first < n and np.isnan(a[first]):
+        first += 1
+    if first == n:
+        return
+    
+    last = a[first]
+    for i in range(first):
+        a[i] = last
+    for i in range(first + 1, n):
+        v = a[i]
+        if np.isnan(v):
+            a[i] = last
+        else:
+            last = v
+
+
+@njit(cache=True, fastmath=True)
+def rolling_mean(x: np.ndarray, w: int) -> np.ndarray:
+    """
+    Trailing rolling mean, matching pandas' Series.rolling(w).mean()
+    
+    Args:
+        x: Price array (float32 or float64)
+        w: Window size
+    
+    Returns:
+        Array of the same length, NaN for the first w-1 entries
+    """
+    n = x.shape[0]
+    out = np.empty_like(x)
+    out[:min(w - 1, n)] = np.nan
+    if n < w:
+        return out
+    
+    s = 0.0
+    for i in range(w):
+        s += x[i]
+    out[w - 1] = s / w
+    
+    for i in range(w, n):
+        s += x[i] - x[i - w]
+        out[i] = s / w
+    
+    return out
+
+
+@njit(cache=True, fastmath=True)
+def rolling_std(x: np.ndarray, w: int) -> np.ndarray:
+    """
+    Trailing rolling sample standard deviation (ddof=1),
+    matching pandas' Series.rolling(w).std()
+    
+    Args:
+        x: Price array (float32 or float64)
+        w: Window size
+    
+    Returns:
+        Array of the same length, NaN for the first w-1 entries
+    """
+    n = x.shape[0]
+    out = np.empty_like(x)
+    out[:min(w - 1, n)] = np.nan
+    if n < w:
+        return out
+    
+    # Sums are taken around the first value to limit cancellation
+    shift = x[0]
+    s = 0.0
+    ss = 0.0
+    for i in range(w):
+        d = x[i] - shift
+        s += d
+        ss += d * d
+    out[w - 1] = np.sqrt(max((ss - s * s / w) / (w - 1), 0.0))
+    
+    for i in range(w, n):
+        d_in = x[i] - shift
+        d_out = x[i - w] - shift
+        s += d_in - d_out
+        ss += d_in * d_in - d_out * d_out
+        out[i] = np.sqrt(max((ss - s * s / w) / (w - 1), 0.0))
+    
+    return out
+
+
+
+@njit(cache=True, fastmath=True)
+def volatility_stats(price: np.ndarray, window: int):
+    """
+    Annualised rolling volatility of daily returns and the recent trend
+    in one pass, equivalent to price.pct_change().rolling(window).std()
+    * sqrt(252) and a degree-1 polyfit over the last window prices
+    
+    Args:
+        price: Price array (float32 or float64), oldest first
+        window: Window size over returns and for the trend
+    
+    Returns:
+        Tuple of (latest volatility, mean volatility, trend slope);
+        the volatilities are NaN if the history is shorter than
+        window + 1 prices, the slope is 0 for fewer than 2 prices
+    """
+    # Least-squares slope over the last window prices, with centred x
+    m = min(window, price.shape[0])
+    slope = 0.0
+    if m >= 2:
+        start = price.shape[0] - m
+        x_mean = (m - 1) / 2.0
+        sxy = 0.0
+        sxx = 0.0
+        for j in range(m):
+            dx = j - x_mean
+            sxy += dx * price[start + j]
+            sxx += dx * dx
+        slope = sxy / sxx
+    
+    n = price.shape[0] - 1
+    if n < window:
+        return np.nan, np.nan, slope
+    
+    returns = np.empty(n)
+    for i in range(n):
+        returns[i] = np.float64(price[i + 1]) / price[i] - 1.0
+    
+    scale = math.sqrt(TRADING_DAYS)
+    s = 0.0
+    ss = 0.0
+    for i in range(window):
+        s += returns[i]
+        ss += returns[i] * returns[i]
+    last_vol = math.sqrt(max((ss - s * s / window) / (window - 1), 0.0)) * scale
+    vol_sum = last_vol
+    
+    for i in range(window, n):
+        r_in = returns[i]
+        r_out = returns[i - window]
+        s += r_in - r_out
+        ss += r_in * r_in - r_out * r_out
+        last_vol = math.sqrt(max((ss - s * s / window) / (window - 1), 0.0)) * scale
+        vol_sum += last_vol
+    
+    return last_vol, vol_sum / (n - window + 1), slope
+
+
+def warm_up():
+    """
+    Compile (or load from the on-disk cache) every kernel for float32
+    and float64 input, so the first request doesn't pay the JIT latency
+    """
+    for dtype in (np.float32, np.float64):
+        sample = np.linspace(1.0, 2.0, 8).astype(dtype)
+        ffill_inplace(sample.copy())
+        rolling_mean(sample, 3)
+        rolling_std(sample, 3)
+        volatility_stats(sample, 3)
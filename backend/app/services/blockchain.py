@@ -4,7 +4,10 @@ Simulates blockchain functionality for contract transparency
 """
 
 import hashlib
-import json
+import struct
+import time
+import orjson
+from collections import defaultdict
 from datetime import datetime
 from typing import List, Dict, Optional
 from loguru import logger
@@ -13,6 +16,21 @@ from web3 import Web3
 from app.core.config import settings
 
 
+# Deterministic JSON encoding used for every hash in this module
+CANONICAL_JSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NAIVE_UTC
+
+
+def canonical_json(obj) -> bytes:
+    """Serialize to compact JSON bytes with sorted keys"""
+    return orjson.dumps(obj, option=CANONICAL_JSON_OPTIONS)
+
+
+# Binary block layout for hashing: a header of index and the lengths of
+# the variable-size fields, then timestamp, data JSON, previous hash and nonce
+BLOCK_HEADER = struct.Struct("<QHI")
+BLOCK_NONCE = struct.Struct("<Q")
+
+
 class Block:
     """Blockchain block structure"""
     
@@ -28,27 +46,46 @@ class Block:
         self.data = data
         self.previous_hash = previous_hash
         self.nonce = 0
-        self.hash = self.calculate_hash()
+        # Set by mine_block
+        self.hash: Optional[str] = None
+    
+    def _hash_prefix(self) -> bytes:
+        """
+        Pack every hashed field except the nonce, from the block's current values
+        
+        Returns:
+            Bytes that the packed nonce is appended to before hashing
+        """
+        timestamp = self.timestamp.encode()
+        data_bytes = canonical_json(self.data)
+        
+        return b"".join((
+            BLOCK_HEADER.pack(self.index, len(timestamp), len(data_bytes)),
+            timestamp,
+            data_bytes,
+            self.previous_hash.encode()
+        ))
     
     def calculate_hash(self) -> str:
         """Calculate block hash"""
-        block_string = json.dumps({
-            "index": self.index,
-            "timestamp": self.timestamp,
-            "data": self.data,
-            "previous_hash": self.previous_hash,
-            "nonce": self.nonce
-        }, sort_keys=True)
-        
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        return hashlib.sha256(self._hash_prefix() + BLOCK_NONCE.pack(self.nonce)).hexdigest()
     
     def mine_block(self, difficulty: int = 2):
         """Mine block with proof of work"""
         target = "0" * difficulty
         
-        while self.hash[:difficulty] != target:
+        # Absorb the fixed prefix once; each trial only hashes the 8-byte nonce
+        base = hashlib.sha256(self._hash_prefix())
+        
+        while True:
+            trial = base.copy()
+            trial.update(BLOCK_NONCE.pack(self.nonce))
+            block_hash = trial.hexdigest()
+            if block_hash[:difficulty] == target:
+                break
             self.nonce += 1
-            self.hash = self.calculate_hash()
+        
+        self.hash = block_hash
     
     def to_dict(self) -> Dict:
         """Convert block to dictionary"""
@@ -71,6 +108,11 @@ class MockBlockchain:
     def __init__(self):
         self.chain: List[Block] = []
         self.difficulty = 2
+        
+        # Lookup indexes, maintained as blocks are appended
+        self._user_index: Dict[str, List[int]] = defaultdict(list)
+        self._hash_index: Dict[str, int] = {}
+        
         self.create_genesis_block()
     
     def create_genesis_block(self):
@@ -83,6 +125,7 @@ class MockBlockchain:
         )
         genesis_block.mine_block(self.difficulty)
         self.chain.append(genesis_block)
+        self._hash_index[genesis_block.hash] = genesis_block.index
         logger.info("🔗 Genesis block created")
     
     def get_latest_block(self) -> Block:
@@ -110,6 +153,11 @@ class MockBlockchain:
         
         new_block.mine_block(self.difficulty)
         self.chain.append(new_block)
+        self._hash_index[new_block.hash] = new_block.index
+        
+        user_id = contract_data.get("user_id")
+        if user_id:
+            self._user_index[user_id].append(new_block.index)
         
         logger.info(f"🔗 Block {new_block.index} added to blockchain")
         
@@ -119,13 +167,13 @@ class MockBlockchain:
         """Validate the blockchain integrity"""
         for i in range(1, len(self.chain)):
             current_block = self.chain[i]
-            previous_block = self.chain[i-1]
+            previous_block = self.chain[i - 1]
             
-            # Check if current block hash is valid
+            # Check that the recorded hash matches the block's current contents
             if current_block.hash != current_block.calculate_hash():
                 return False
             
-            # Check if previous hash matches
+            # Check that the block still points at its predecessor
             if current_block.previous_hash != previous_block.hash:
                 return False
         
@@ -133,18 +181,14 @@ class MockBlockchain:
     
     def get_block_by_hash(self, block_hash: str) -> Optional[Block]:
         """Get block by hash"""
-        for block in self.chain:
-            if block.hash == block_hash:
-                return block
-        return None
+        index = self._hash_index.get(block_hash)
+        if index is None:
+            return None
+        return self.chain[index]
     
     def get_blocks_by_user(self, user_id: str) -> List[Block]:
         """Get all blocks for a specific user"""
-        user_blocks = []
-        for block in self.chain:
-            if block.data.get("user_id") == user_id:
-                user_blocks.append(block)
-        return user_blocks
+        return [self.chain[i] for i in self._user_index.get(user_id, ())]
     
     def get_chain_info(self) -> Dict:
         """Get blockchain information"""
@@ -160,6 +204,10 @@ class MockBlockchain:
         return [block.to_dict() for block in self.chain]
 
 
+# How long a node connectivity check result is reused, in seconds
+CONNECTIVITY_CHECK_TTL_SECONDS = 5.0
+
+
 class Web3BlockchainService:
     """
     Web3 Blockchain Service for Ganache/Polygon integration
@@ -169,14 +217,32 @@ class Web3BlockchainService:
         self.w3 = None
         self.contract = None
         self.account = None
+        self._connected = False
+        self._last_connectivity_check = 0.0
         self.initialize_connection()
     
+    def is_connected(self) -> bool:
+        """
+        Check the node connection, reusing the last result for a few seconds
+        so that each record doesn't pay for a JSON-RPC round trip
+        """
+        if self.w3 is None:
+            return False
+        
+        now = time.monotonic()
+        if now - self._last_connectivity_check > CONNECTIVITY_CHECK_TTL_SECONDS:
+            self._connected = self.w3.is_connected()
+            self._last_connectivity_check = now
+        
+        return self._connected
+    
     def initialize_connection(self):
         """Initialize connection to blockchain"""
         try:
             self.w3 = Web3(Web3.HTTPProvider(settings.BLOCKCHAIN_RPC_URL))
+            self._last_connectivity_check = 0.0
             
-            if self.w3.is_connected():
+            if self.is_connected():
                 logger.info(f"✅ Connected to blockchain at {settings.BLOCKCHAIN_RPC_URL}")
                 
                 # Load contract if address is provided
@@ -205,10 +271,10 @@ class Web3BlockchainService:
             Transaction details
         """
         try:
-            if self.w3 and self.w3.is_connected():
+            if self.is_connected():
                 # Send transaction to smart contract
                 # For MVP, returning mock data
-                tx_hash = self.w3.keccak(text=json.dumps(contract_data))
+                tx_hash = self.w3.keccak(primitive=canonical_json(contract_data))
                 
                 return {
                     "tx_hash": tx_hash.hex(),
@@ -219,7 +285,7 @@ class Web3BlockchainService:
                 logger.warning("⚠️ Blockchain not connected, using mock")
                 return {
                     "tx_hash": hashlib.sha256(
-                        json.dumps(contract_data).encode()
+                        canonical_json(contract_data)
                     ).hexdigest(),
                     "block_number": 0,
                     "timestamp": datetime.utcnow().isoformat()
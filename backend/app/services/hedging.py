@@ -3,19 +3,57 @@ Virtual Hedging Simulator Service
 Manages creation, tracking, and settlement of simulated hedging contracts
 """
 
-from typing import List, Dict, Optional
-from datetime import datetime, date
+import asyncio
+from typing import List, Dict, Iterable, Optional
+from datetime import datetime, date, time, timezone
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 from loguru import logger
 
-from app.core.database import get_collection
+from app.core.config import settings
+from app.core.database import get_collection, get_redis
 from app.models.contract import (
     Contract,
     ContractCreate,
     ContractStatus,
     ContractSummary,
+    ContractType,
     GainLossCalculation
 )
+from app.models.price import CommodityType
+
+
+# Redis key prefix for cached latest prices; entries live for one
+# price-check interval, the cadence at which prices change
+LATEST_PRICE_KEY_PREFIX = "price:"
+LATEST_PRICE_TTL_SECONDS = settings.VOLATILITY_CHECK_INTERVAL_MINUTES * 60
+
+# In-flight latest-price queries keyed by commodity, so concurrent
+# cache misses for the same commodity share a single query
+_inflight_prices: Dict[str, asyncio.Future] = {}
+
+# Result of a shared lookup whose leader was cancelled before finishing;
+# callers waiting on it run the query themselves
+_LOOKUP_ABANDONED = object()
+
+
+def _to_contract(doc: Dict) -> Contract:
+    """
+    Build a Contract from a trusted database document
+    Skips validation, since the document was written by this service
+    """
+    settlement_date = doc.get("settlement_date")
+    if isinstance(settlement_date, datetime):
+        # Stored as a UTC midnight datetime, since BSON has no date type
+        doc["settlement_date"] = settlement_date.date()
+    
+    # model_construct keeps values as given; enum fields must hold enum
+    # members, or serializing the contract warns on every response
+    doc["commodity"] = CommodityType(doc["commodity"])
+    doc["contract_type"] = ContractType(doc["contract_type"])
+    doc["status"] = ContractStatus(doc["status"])
+    
+    return Contract.model_construct(**doc)
 
 
 class HedgingService:
@@ -24,6 +62,7 @@ class HedgingService:
     def __init__(self):
         self.contracts_collection = get_collection("contracts")
         self.prices_collection = get_collection("prices")
+        self.settlement_events_collection = get_collection("settlement_events")
     
     async def create_contract(
         self,
@@ -41,22 +80,41 @@ class HedgingService:
             Created contract
         """
         try:
+            now = datetime.now(timezone.utc)
+            contract_id = ObjectId()
+            
+            # BSON has no date type; settle at midnight UTC on the settlement date
+            settle_at = datetime.combine(
+                contract_data.settlement_date, time.min, tzinfo=timezone.utc
+            )
+            
             # Create contract document
             contract_dict = {
+                "_id": contract_id,
                 "user_id": user_id,
                 "commodity": contract_data.commodity,
                 "contract_type": contract_data.contract_type,
                 "quantity": contract_data.quantity,
                 "locked_price": contract_data.locked_price,
-                "settlement_date": contract_data.settlement_date,
+                "settlement_date": settle_at,
                 "status": ContractStatus.ACTIVE,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
+                "created_at": now,
+                "updated_at": now
             }
             
+            # Schedule settlement first: the TTL monitor deletes this event
+            # once the settlement date is reached, which triggers settlement.
+            # If the contract insert below fails, the orphaned event expires
+            # without matching an active contract
+            await self.settlement_events_collection.insert_one({
+                "_id": contract_id,
+                "settle_at": settle_at
+            })
+            
             # Insert into database
-            result = await self.contracts_collection.insert_one(contract_dict)
-            contract_dict["_id"] = str(result.inserted_id)
+            await self.contracts_collection.insert_one(contract_dict)
+            
+            contract_dict["_id"] = str(contract_id)
             
             logger.info(f"✅ Created contract {contract_dict['_id']} for user {user_id}")
             
@@ -86,19 +144,32 @@ class HedgingService:
             if status:
                 query["status"] = status
             
-            cursor = self.contracts_collection.find(query)
-            contracts = []
+            # user_id is known from the query, so it isn't sent back; large
+            # batches cut getMore round trips for users with many contracts
+            cursor = self.contracts_collection.find(
+                query,
+                projection={"user_id": 0}
+            ).batch_size(1000)
+            docs = [doc async for doc in cursor]
+            
+            # One price lookup for every commodity the user holds
+            latest_prices = await self.get_latest_prices(
+                {doc["commodity"] for doc in docs}
+            )
             
-            async for doc in cursor:
+            contracts = []
+            for doc in docs:
                 doc["_id"] = str(doc["_id"])
+                doc["user_id"] = user_id
                 
                 # Calculate current gain/loss
-                gain_loss = await self.calculate_gain_loss(doc["_id"])
-                if gain_loss:
+                current_price = latest_prices.get(doc["commodity"])
+                if current_price is not None:
+                    gain_loss = self._compute_gain_loss(doc, current_price)
                     doc["current_market_price"] = gain_loss.current_price
                     doc["potential_gain_loss"] = gain_loss.potential_gain_loss
                 
-                contracts.append(Contract(**doc))
+                contracts.append(_to_contract(doc))
             
             return contracts
             
@@ -125,12 +196,12 @@ class HedgingService:
                 doc["_id"] = str(doc["_id"])
                 
                 # Calculate current gain/loss
-                gain_loss = await self.calculate_gain_loss(contract_id)
+                gain_loss = await self.calculate_gain_loss(doc)
                 if gain_loss:
                     doc["current_market_price"] = gain_loss.current_price
                     doc["potential_gain_loss"] = gain_loss.potential_gain_loss
                 
-                return Contract(**doc)
+                return _to_contract(doc)
             
             return None
             
@@ -138,55 +209,179 @@ class HedgingService:
             logger.error(f"❌ Error fetching contract: {str(e)}")
             raise
     
+    async def get_latest_prices(
+        self,
+        commodities: Iterable[str],
+        use_cache: bool = True
+    ) -> Dict[str, float]:
+        """
+        Get the most recent market price of each commodity
+        Cached prices come from Redis; the rest from one aggregation
+        
+        Args:
+            commodities: Commodity names
+            use_cache: Serve prices from Redis; settlement passes False,
+                since cached prices can be a price-check interval old
+        
+        Returns:
+            Latest price per commodity (commodities without prices are omitted)
+        """
+        commodities = list(commodities)
+        if not commodities:
+            return {}
+        
+        latest_prices = {}
+        redis = get_redis()
+        
+        # Serve what we can from the Redis cache
+        if use_cache and redis is not None:
+            try:
+                cached = await redis.mget(
+                    [LATEST_PRICE_KEY_PREFIX + commodity for commodity in commodities]
+                )
+                latest_prices = {
+                    commodity: float(price)
+                    for commodity, price in zip(commodities, cached)
+                    if price is not None
+                }
+            except Exception as e:
+                logger.warning(f"⚠️ Price cache read failed: {str(e)}")
+        
+        missing = [c for c in commodities if c not in latest_prices]
+        if not missing:
+            return latest_prices
+        
+        # Share lookups already in flight; start one query for the rest.
+        # No await between the check and the registration, so no lock is needed
+        waiting = {c: _inflight_prices[c] for c in missing if c in _inflight_prices}
+        leading = [c for c in missing if c not in waiting]
+        
+        if leading:
+            loop = asyncio.get_running_loop()
+            futures = {c: loop.create_future() for c in leading}
+            _inflight_prices.update(futures)
+            try:
+                fetched = await self._fetch_latest_prices(leading, redis)
+                for commodity, future in futures.items():
+                    future.set_result(fetched.get(commodity))
+                latest_prices.update(fetched)
+            except Exception as e:
+                for future in futures.values():
+                    future.set_exception(e)
+                    # Mark the exception as retrieved when no other caller awaits it
+                    future.exception()
+                raise
+            finally:
+                for commodity, future in futures.items():
+                    # Only reached unresolved when this caller was cancelled;
+                    # release the waiters instead of cancelling them too
+                    if not future.done():
+                        future.set_result(_LOOKUP_ABANDONED)
+                    _inflight_prices.pop(commodity, None)
+        
+        if waiting:
+            # Shielded, so a cancelled waiter cannot cancel the shared lookup
+            shared = await asyncio.gather(*map(asyncio.shield, waiting.values()))
+            abandoned = []
+            for commodity, price in zip(waiting, shared):
+                if price is _LOOKUP_ABANDONED:
+                    abandoned.append(commodity)
+                elif price is not None:
+                    latest_prices[commodity] = price
+            
+            if abandoned:
+                latest_prices.update(await self._fetch_latest_prices(abandoned, redis))
+        
+        return latest_prices
+    
+    async def _fetch_latest_prices(self, commodities: List[str], redis) -> Dict[str, float]:
+        """
+        Query the latest prices in one aggregation and cache them in Redis
+        
+        Args:
+            commodities: Commodity names
+            redis: Redis client, or None when Redis is unavailable
+        
+        Returns:
+            Latest price per commodity (commodities without prices are omitted)
+        """
+        cursor = await self.prices_collection.aggregate([
+            {"$match": {"commodity": {"$in": commodities}}},
+            # Matches the (commodity, date desc) index, so no in-memory sort
+            {"$sort": {"commodity": 1, "date": -1}},
+            {"$group": {"_id": "$commodity", "price": {"$first": "$price"}}}
+        ])
+        fetched = {doc["_id"]: doc["price"] async for doc in cursor}
+        
+        # Populate the cache for the next readers
+        if redis is not None and fetched:
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for commodity, price in fetched.items():
+                        pipe.setex(
+                            LATEST_PRICE_KEY_PREFIX + commodity,
+                            LATEST_PRICE_TTL_SECONDS,
+                            price
+                        )
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"⚠️ Price cache write failed: {str(e)}")
+        
+        return fetched
+    
+    @staticmethod
+    def _compute_gain_loss(contract: Dict, current_price: float) -> GainLossCalculation:
+        """
+        Calculate gain/loss for a loaded contract at a given market price
+        
+        Args:
+            contract: Contract document
+            current_price: Current market price
+        
+        Returns:
+            Gain/loss calculation
+        """
+        locked_price = contract["locked_price"]
+        quantity = contract["quantity"]
+        
+        # Calculate gain/loss
+        price_difference = current_price - locked_price
+        potential_gain_loss = price_difference * quantity
+        percentage_change = (price_difference / locked_price) * 100
+        
+        return GainLossCalculation(
+            contract_id=str(contract["_id"]),
+            locked_price=locked_price,
+            current_price=current_price,
+            quantity=quantity,
+            potential_gain_loss=potential_gain_loss,
+            percentage_change=percentage_change,
+            is_profitable=potential_gain_loss > 0
+        )
+    
     async def calculate_gain_loss(
         self,
-        contract_id: str
+        contract: Dict
     ) -> Optional[GainLossCalculation]:
         """
         Calculate potential gain/loss for a contract
         
         Args:
-            contract_id: Contract ID
+            contract: Contract document (already loaded)
             
         Returns:
-            Gain/loss calculation
+            Gain/loss calculation, or None without price data
         """
         try:
-            contract = await self.contracts_collection.find_one(
-                {"_id": ObjectId(contract_id)}
-            )
-            
-            if not contract:
-                return None
-            
             # Get current market price
-            latest_price = await self.prices_collection.find_one(
-                {"commodity": contract["commodity"]},
-                sort=[("date", -1)]
-            )
+            latest_prices = await self.get_latest_prices([contract["commodity"]])
+            current_price = latest_prices.get(contract["commodity"])
             
-            if not latest_price:
+            if current_price is None:
                 logger.warning(f"No price data found for {contract['commodity']}")
                 return None
             
-            current_price = latest_price["price"]
-            locked_price = contract["locked_price"]
-            quantity = contract["quantity"]
-            
-            # Calculate gain/loss
-            price_difference = current_price - locked_price
-            potential_gain_loss = price_difference * quantity
-            percentage_change = (price_difference / locked_price) * 100
-            
-            return GainLossCalculation(
-                contract_id=str(contract["_id"]),
-                locked_price=locked_price,
-                current_price=current_price,
-                quantity=quantity,
-                potential_gain_loss=potential_gain_loss,
-                percentage_change=percentage_change,
-                is_profitable=potential_gain_loss > 0
-            )
+            return self._compute_gain_loss(contract, current_price)
             
         except Exception as e:
             logger.error(f"❌ Error calculating gain/loss: {str(e)}")
@@ -208,37 +403,120 @@ class HedgingService:
             Settled contract
         """
         try:
-            contract = await self.contracts_collection.find_one(
-                {"_id": ObjectId(contract_id)}
-            )
-            
-            if not contract:
-                raise ValueError("Contract not found")
-            
-            # Calculate final gain/loss
-            actual_gain_loss = (final_price - contract["locked_price"]) * contract["quantity"]
+            now = datetime.now(timezone.utc)
             
-            # Update contract
-            await self.contracts_collection.update_one(
+            # Update contract, calculating the final gain/loss from the stored
+            # locked price and quantity, and read it back in the same round trip
+            contract = await self.contracts_collection.find_one_and_update(
                 {"_id": ObjectId(contract_id)},
-                {
+                [{
                     "$set": {
                         "status": ContractStatus.SETTLED,
-                        "actual_gain_loss": actual_gain_loss,
-                        "settled_at": datetime.utcnow(),
-                        "updated_at": datetime.utcnow()
+                        "actual_gain_loss": {
+                            "$multiply": [
+                                {"$subtract": [final_price, "$locked_price"]},
+                                "$quantity"
+                            ]
+                        },
+                        "settled_at": now,
+                        "updated_at": now
                     }
-                }
+                }],
+                return_document=ReturnDocument.AFTER
             )
             
+            if not contract:
+                raise ValueError("Contract not found")
+            
             logger.info(f"✅ Settled contract {contract_id}")
             
-            return await self.get_contract_by_id(contract_id)
+            # The settlement price is the contract's final market price
+            contract["_id"] = str(contract["_id"])
+            contract["current_market_price"] = final_price
+            contract["potential_gain_loss"] = contract["actual_gain_loss"]
+            
+            return _to_contract(contract)
             
         except Exception as e:
             logger.error(f"❌ Error settling contract: {str(e)}")
             raise
     
+    async def settle_contracts(
+        self,
+        contracts: List[Dict],
+        final_prices: Dict[str, float]
+    ) -> int:
+        """
+        Settle many contracts in a single bulk write
+        
+        Args:
+            contracts: Contract documents to settle
+            final_prices: Final market price per commodity; contracts
+                whose commodity has no price are left unsettled
+        
+        Returns:
+            Number of contracts settled
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            operations = [
+                # Only active contracts, so concurrent settlement runs
+                # can't overwrite a result already recorded
+                UpdateOne(
+                    {"_id": contract["_id"], "status": ContractStatus.ACTIVE},
+                    {
+                        "$set": {
+                            "status": ContractStatus.SETTLED,
+                            "actual_gain_loss": (
+                                final_prices[contract["commodity"]] - contract["locked_price"]
+                            ) * contract["quantity"],
+                            "settled_at": now,
+                            "updated_at": now
+                        }
+                    }
+                )
+                for contract in contracts
+                if contract["commodity"] in final_prices
+            ]
+            
+            if not operations:
+                return 0
+            
+            result = await self.contracts_collection.bulk_write(operations, ordered=False)
+            
+            logger.info(f"✅ Settled {result.modified_count} contracts")
+            
+            return result.modified_count
+        
+        except Exception as e:
+            logger.error(f"❌ Error settling contracts: {str(e)}")
+            raise
+    
+    async def settle_contracts_by_id(self, contract_ids: List[ObjectId]) -> int:
+        """
+        Settle the given contracts that are still active at current market prices
+        
+        Args:
+            contract_ids: Contract IDs
+        
+        Returns:
+            Number of contracts settled
+        """
+        cursor = self.contracts_collection.find({
+            "_id": {"$in": contract_ids},
+            "status": ContractStatus.ACTIVE
+        })
+        contracts = [contract async for contract in cursor]
+        if not contracts:
+            return 0
+        
+        latest_prices = await self.get_latest_prices(
+            {contract["commodity"] for contract in contracts},
+            use_cache=False
+        )
+        
+        return await self.settle_contracts(contracts, latest_prices)
+    
     async def get_user_summary(self, user_id: str) -> ContractSummary:
         """
         Get summary of user's contracts
@@ -250,33 +528,76 @@ class HedgingService:
             Contract summary
         """
         try:
-            all_contracts = await self.get_user_contracts(user_id)
-            
-            active_contracts = [c for c in all_contracts if c.status == ContractStatus.ACTIVE]
-            settled_contracts = [c for c in all_contracts if c.status == ContractStatus.SETTLED]
-            
-            total_quantity = sum(c.quantity for c in all_contracts)
-            total_locked_value = sum(c.locked_price * c.quantity for c in all_contracts)
-            total_potential_gain_loss = sum(
-                c.potential_gain_loss for c in active_contracts if c.potential_gain_loss
-            )
-            
-            # Group by commodity
-            contracts_by_commodity = {}
-            for contract in all_contracts:
-                commodity = contract.commodity
-                if commodity not in contracts_by_commodity:
-                    contracts_by_commodity[commodity] = 0
-                contracts_by_commodity[commodity] += 1
+            cursor = await self.contracts_collection.aggregate([
+                {"$match": {"user_id": user_id}},
+                {"$facet": {
+                    "totals": [
+                        {"$group": {
+                            "_id": None,
+                            "total": {"$sum": 1},
+                            "active": {"$sum": {
+                                "$cond": [{"$eq": ["$status", ContractStatus.ACTIVE]}, 1, 0]
+                            }},
+                            "settled": {"$sum": {
+                                "$cond": [{"$eq": ["$status", ContractStatus.SETTLED]}, 1, 0]
+                            }},
+                            "total_quantity": {"$sum": "$quantity"},
+                            "total_locked_value": {
+                                "$sum": {"$multiply": ["$locked_price", "$quantity"]}
+                            }
+                        }}
+                    ],
+                    "by_commodity": [
+                        {"$group": {"_id": "$commodity", "count": {"$sum": 1}}}
+                    ],
+                    # Sum of (latest price - locked price) * quantity over active
+                    # contracts, with one latest-price lookup per commodity
+                    "potential": [
+                        {"$match": {"status": ContractStatus.ACTIVE}},
+                        {"$group": {
+                            "_id": "$commodity",
+                            "quantity": {"$sum": "$quantity"},
+                            "locked_value": {
+                                "$sum": {"$multiply": ["$locked_price", "$quantity"]}
+                            }
+                        }},
+                        {"$lookup": {
+                            "from": "prices",
+                            "let": {"commodity": "$_id"},
+                            "pipeline": [
+                                {"$match": {"$expr": {"$eq": ["$commodity", "$$commodity"]}}},
+                                {"$sort": {"date": -1}},
+                                {"$limit": 1},
+                                {"$project": {"_id": 0, "price": 1}}
+                            ],
+                            "as": "latest"
+                        }},
+                        {"$unwind": "$latest"},
+                        {"$group": {
+                            "_id": None,
+                            "total": {"$sum": {"$subtract": [
+                                {"$multiply": ["$latest.price", "$quantity"]},
+                                "$locked_value"
+                            ]}}
+                        }}
+                    ]
+                }}
+            ])
+            
+            result = (await cursor.to_list(length=1))[0]
+            totals = result["totals"][0] if result["totals"] else {}
+            potential = result["potential"][0]["total"] if result["potential"] else 0.0
             
             return ContractSummary(
-                total_contracts=len(all_contracts),
-                active_contracts=len(active_contracts),
-                settled_contracts=len(settled_contracts),
-                total_quantity=total_quantity,
-                total_locked_value=total_locked_value,
-                total_potential_gain_loss=total_potential_gain_loss,
-                contracts_by_commodity=contracts_by_commodity
+                total_contracts=totals.get("total", 0),
+                active_contracts=totals.get("active", 0),
+                settled_contracts=totals.get("settled", 0),
+                total_quantity=totals.get("total_quantity", 0.0),
+                total_locked_value=totals.get("total_locked_value", 0.0),
+                total_potential_gain_loss=potential,
+                contracts_by_commodity={
+                    group["_id"]: group["count"] for group in result["by_commodity"]
+                }
             )
             
         except Exception as e:
@@ -307,7 +628,7 @@ class HedgingService:
                     "$set": {
                         "blockchain_tx_hash": tx_hash,
                         "blockchain_block_number": block_number,
-                        "updated_at": datetime.utcnow()
+                        "updated_at": datetime.now(timezone.utc)
                     }
                 }
             )
@@ -6,11 +6,15 @@ Scheduler for background tasks
 - Model retraining
 """
 
+import asyncio
+from contextlib import suppress
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
 from loguru import logger
+from pymongo.errors import OperationFailure, PyMongoError
 
 from app.core.config import settings
 
@@ -18,6 +22,18 @@ from app.core.config import settings
 # Global scheduler instance
 scheduler = AsyncIOScheduler()
 
+# Background task settling contracts as their settlement events expire
+settlement_listener: Optional[asyncio.Task] = None
+
+# Delay before re-opening the settlement change stream after an error
+SETTLEMENT_LISTENER_RETRY_SECONDS = 30
+
+# Server error code when a resume token has aged out of the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# Commodities with a forecasting model
+MODEL_COMMODITIES = ["soybean", "mustard", "groundnut", "sunflower"]
+
 
 async def check_price_volatility():
     """
@@ -54,27 +70,21 @@ async def settle_expired_contracts():
         contracts_collection = get_collection("contracts")
         
         # Find contracts that should be settled
-        today = datetime.utcnow().date()
+        # (settlement dates are stored as midnight UTC datetimes)
+        now = datetime.now(timezone.utc)
         cursor = contracts_collection.find({
             "status": ContractStatus.ACTIVE,
-            "settlement_date": {"$lte": today}
+            "settlement_date": {"$lte": now}
         })
+        expired = [contract async for contract in cursor]
         
-        settled_count = 0
-        async for contract in cursor:
-            # Get current market price
-            prices_collection = get_collection("prices")
-            latest_price = await prices_collection.find_one(
-                {"commodity": contract["commodity"]},
-                sort=[("date", -1)]
-            )
-            
-            if latest_price:
-                await hedging_service.settle_contract(
-                    str(contract["_id"]),
-                    latest_price["price"]
-                )
-                settled_count += 1
+        # Current market price of every commodity involved, in one query
+        latest_prices = await hedging_service.get_latest_prices(
+            {contract["commodity"] for contract in expired},
+            use_cache=False
+        )
+        
+        settled_count = await hedging_service.settle_contracts(expired, latest_prices)
         
         logger.info(f"✅ Settled {settled_count} contracts")
         
@@ -82,6 +92,58 @@ async def settle_expired_contracts():
         logger.error(f"❌ Error settling contracts: {str(e)}")
 
 
+async def watch_settlement_events():
+    """
+    Settle contracts as soon as their settlement date is reached
+    The TTL index on settlement_events deletes each contract's event when
+    it falls due; this listens for those deletes on a change stream
+    """
+    from app.services.hedging import HedgingService
+    from app.core.database import get_collection
+    
+    hedging_service = HedgingService()
+    events_collection = get_collection("settlement_events")
+    # Position after the last handled event, so a reopened stream
+    # picks up the events that expired while it was down
+    resume_token = None
+    
+    while True:
+        try:
+            async with await events_collection.watch(
+                [{"$match": {"operationType": "delete"}}],
+                resume_after=resume_token
+            ) as stream:
+                logger.info("✅ Listening for settlement events")
+                
+                async for change in stream:
+                    contract_id = change["documentKey"]["_id"]
+                    try:
+                        await hedging_service.settle_contracts_by_id([contract_id])
+                    except Exception as e:
+                        logger.error(f"❌ Error settling contract {contract_id}: {str(e)}")
+                    resume_token = stream.resume_token
+        
+        except OperationFailure as e:
+            if resume_token is not None and e.code == CHANGE_STREAM_HISTORY_LOST:
+                # Down too long to resume; the daily job settles what was missed
+                logger.warning(f"⚠️ Settlement event history lost, listening from now: {str(e)}")
+                resume_token = None
+                continue
+            
+            # Change streams need a replica set; daily settlement still runs
+            logger.warning(f"⚠️ Settlement events unavailable, using daily settlement: {str(e)}")
+            return
+        
+        except PyMongoError as e:
+            logger.error(f"❌ Settlement event stream error: {str(e)}")
+            await asyncio.sleep(SETTLEMENT_LISTENER_RETRY_SECONDS)
+        
+        except Exception as e:
+            # e.g. a malformed event; keep listening rather than end the task
+            logger.error(f"❌ Unexpected settlement event stream error: {str(e)}")
+            await asyncio.sleep(SETTLEMENT_LISTENER_RETRY_SECONDS)
+
+
 async def retrain_ml_models():
     """
     Retrain ML forecasting models
@@ -90,33 +152,40 @@ async def retrain_ml_models():
     try:
         logger.info("🤖 Retraining ML models...")
         
-        from app.ml.forecaster import get_forecaster
+        from app.ml.forecaster import get_forecaster, train_all
         from app.core.database import get_collection
         
         prices_collection = get_collection("prices")
         
-        # Retrain for each commodity
-        commodities = ["soybean", "mustard", "groundnut", "sunflower"]
+        # Fetch every commodity's last year of data in one aggregation;
+        # the sort follows the (commodity, date desc) index and $firstN
+        # keeps only the newest 365 points of each group
+        cursor = await prices_collection.aggregate([
+            {"$match": {"commodity": {"$in": MODEL_COMMODITIES}}},
+            {"$sort": {"commodity": 1, "date": -1}},
+            {"$group": {
+                "_id": "$commodity",
+                "history": {"$firstN": {
+                    "input": {"date": "$date", "price": "$price"},
+                    "n": 365
+                }}
+            }}
+        ])
+        # Histories come back newest first; training expects oldest first
+        histories = [(doc["_id"], doc["history"][::-1]) async for doc in cursor]
         
-        for commodity in commodities:
-            # Fetch historical prices
-            cursor = prices_collection.find(
-                {"commodity": commodity}
-            ).sort("date", 1).limit(365)  # Last year of data
-            
-            price_history = []
-            async for doc in cursor:
-                price_history.append({
-                    "date": doc["date"],
-                    "price": doc["price"]
-                })
-            
-            if len(price_history) >= 30:  # Minimum data required
-                forecaster = get_forecaster(commodity)
-                forecaster.train_arima_model(price_history)
-                
-                # Save model
-                forecaster.save_model(f"models/{commodity}_model.pkl")
+        # Train every commodity with enough data (minimum 30 points) in
+        # parallel worker processes, waiting off the event loop
+        trainable = {
+            commodity: price_history
+            for commodity, price_history in histories
+            if len(price_history) >= 30
+        }
+        results = await asyncio.to_thread(train_all, trainable)
+        
+        # Save the models that trained successfully
+        for commodity in results:
+            get_forecaster(commodity).save_model(f"models/{commodity}_model.pkl")
         
         logger.info("✅ ML models retrained successfully")
         
@@ -146,6 +215,8 @@ async def generate_daily_report():
 
 def start_scheduler():
     """Start the background scheduler"""
+    global settlement_listener
+    
     try:
         # Price volatility check - every 30 minutes
         scheduler.add_job(
@@ -158,7 +229,13 @@ def start_scheduler():
             replace_existing=True
         )
         
-        # Contract settlement - daily at midnight
+        # Contract settlement - as settlement events expire
+        settlement_listener = asyncio.get_running_loop().create_task(
+            watch_settlement_events()
+        )
+        
+        # Contract settlement - daily at midnight, catches anything the
+        # event listener missed (e.g. without a replica set)
         scheduler.add_job(
             settle_expired_contracts,
             trigger=CronTrigger(hour=0, minute=0),
@@ -192,10 +269,21 @@ def start_scheduler():
         logger.error(f"❌ Error starting scheduler: {str(e)}")
 
 
-def stop_scheduler():
-    """Stop the background scheduler"""
+async def stop_scheduler():
+    """
+    Stop the background scheduler
+    Waits for the settlement listener to finish, so its change stream is
+    closed before the MongoDB client
+    """
+    global settlement_listener
+    
     try:
         scheduler.shutdown()
+        if settlement_listener is not None:
+            settlement_listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await settlement_listener
+            settlement_listener = None
         logger.info("✅ Background scheduler stopped")
         
     except Exception as e:
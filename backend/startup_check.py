@@ -6,23 +6,38 @@ Checks MongoDB connection and starts the server
 import asyncio
 import sys
 from loguru import logger
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient
+
+from app.core.config import settings
+
+
+# Fail fast: the check should not wait out the driver's 30s default
+STARTUP_CHECK_TIMEOUT_MS = 2000
 
 
 async def check_mongodb():
     """Check if MongoDB is accessible"""
+    client = None
     try:
         logger.info("🔌 Checking MongoDB connection...")
-        client = AsyncIOMotorClient("mongodb://localhost:27017")
+        # A single ping needs a single connection
+        client = AsyncMongoClient(
+            settings.MONGODB_URI,
+            serverSelectionTimeoutMS=STARTUP_CHECK_TIMEOUT_MS,
+            maxPoolSize=1
+        )
         await client.admin.command('ping')
         logger.info("✅ MongoDB is running!")
-        client.close()
         return True
     except Exception as e:
         logger.error(f"❌ MongoDB connection failed: {str(e)}")
         logger.info("💡 Start MongoDB with: docker-compose up mongodb")
         logger.info("   Or install MongoDB locally: https://www.mongodb.com/try/download/community")
         return False
+    finally:
+        # Close on failure too, so the client's background tasks stop
+        if client is not None:
+            await client.close()
 
 
 async def main():
@@ -0,0 +1,76 @@
+"""
+Tests for PriceForecaster data preparation
+Checked against the pandas pipeline it replaced
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.forecaster import PriceForecaster
+
+
+def make_history(n: int = 60):
+    """Price records, newest first, with a leading gap and missing prices"""
+    rng = np.random.default_rng(3)
+    prices = 5000.0 + np.cumsum(rng.normal(0.0, 25.0, n))
+    history = [
+        {"date": f"{day}", "price": float(price)}
+        for day, price in zip(np.datetime64("2024-01-01") + np.arange(n), prices)
+    ]
+    for i in (0, 1, 20, 21, n - 1):
+        history[i]["price"] = None
+    return list(reversed(history))
+
+
+def pandas_prices(history) -> pd.Series:
+    """The original pandas preparation: parse, sort and fill"""
+    df = pd.DataFrame(history)
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values("date").set_index("date")
+    return df["price"].astype(float).ffill().bfill()
+
+
+def test_prepare_price_series_sorts_and_fills():
+    history = make_history()
+    
+    prices = PriceForecaster("soybean").prepare_price_series(history)
+    
+    assert prices.dtype == np.float64
+    np.testing.assert_array_equal(prices, pandas_prices(history).to_numpy())
+
+
+def test_prepare_data_matches_pandas():
+    history = make_history()
+    expected = pandas_prices(history)
+    
+    df = PriceForecaster("soybean").prepare_data(history)
+    
+    assert df.index.equals(expected.index)
+    np.testing.assert_allclose(df["price"], expected, rtol=1e-6)
+    np.testing.assert_array_equal(df["day_of_week"], expected.index.dayofweek)
+    np.testing.assert_array_equal(df["month"], expected.index.month)
+    np.testing.assert_array_equal(df["day_of_year"], expected.index.dayofyear)
+    for column, window, stat in (
+        ("rolling_mean_7", 7, "mean"),
+        ("rolling_std_7", 7, "std"),
+        ("rolling_mean_30", 30, "mean")
+    ):
+        baseline = getattr(expected.rolling(window), stat)()
+        np.testing.assert_allclose(df[column], baseline, rtol=1e-4, atol=1e-2)
+
+
+def test_prepare_data_is_cached_per_history():
+    forecaster = PriceForecaster("soybean")
+    history = make_history()
+    
+    assert forecaster.prepare_data(history) is forecaster.prepare_data(make_history())
+
+
+def test_detect_volatility_reports_latest_known_price():
+    history = make_history()
+    
+    result = PriceForecaster("soybean").detect_volatility(history)
+    
+    # The newest record has no price, so the one before it is reported
+    assert result["current_price"] == pytest.approx(history[1]["price"])
@@ -0,0 +1,116 @@
+"""
+Tests for the Numba forecaster kernels
+Each kernel is checked against the pandas computation it replaced
+"""
+
+import math
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.forecaster_kernels import (
+    ffill_inplace,
+    rolling_mean,
+    rolling_std,
+    volatility_stats
+)
+
+
+# Loose enough for float32 output, tight enough to catch a wrong window
+TOLERANCES = {
+    np.float64: dict(rtol=1e-9, atol=1e-9),
+    np.float32: dict(rtol=1e-4, atol=1e-2)
+}
+
+
+def random_walk(n: int = 120, seed: int = 7) -> np.ndarray:
+    """Daily prices around 5000 INR/quintal"""
+    rng = np.random.default_rng(seed)
+    return 5000.0 + np.cumsum(rng.normal(0.0, 25.0, n))
+
+
+def with_gaps(prices: np.ndarray) -> np.ndarray:
+    """Copy of prices with a leading gap and scattered missing values"""
+    gapped = prices.copy()
+    gapped[:3] = np.nan
+    gapped[10] = np.nan
+    gapped[40:44] = np.nan
+    gapped[-1] = np.nan
+    return gapped
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_ffill_matches_pandas(dtype):
+    prices = with_gaps(random_walk()).astype(dtype)
+    expected = pd.Series(prices).ffill().bfill().to_numpy()
+    
+    ffill_inplace(prices)
+    
+    np.testing.assert_array_equal(prices, expected)
+
+
+def test_ffill_leaves_all_missing_unchanged():
+    prices = np.full(5, np.nan)
+    
+    ffill_inplace(prices)
+    
+    assert np.isnan(prices).all()
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("window", [7, 30])
+def test_rolling_mean_matches_pandas(dtype, window):
+    prices = with_gaps(random_walk()).astype(dtype)
+    ffill_inplace(prices)
+    expected = pd.Series(prices.astype(np.float64)).rolling(window).mean().to_numpy()
+    
+    result = rolling_mean(prices, window)
+    
+    assert result.dtype == dtype
+    np.testing.assert_allclose(result, expected, **TOLERANCES[dtype])
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("window", [7, 30])
+def test_rolling_std_matches_pandas(dtype, window):
+    prices = with_gaps(random_walk()).astype(dtype)
+    ffill_inplace(prices)
+    expected = pd.Series(prices.astype(np.float64)).rolling(window).std().to_numpy()
+    
+    result = rolling_std(prices, window)
+    
+    assert result.dtype == dtype
+    np.testing.assert_allclose(result, expected, **TOLERANCES[dtype])
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_rolling_short_history_is_all_nan(dtype):
+    prices = random_walk(5).astype(dtype)
+    
+    assert np.isnan(rolling_mean(prices, 7)).all()
+    assert np.isnan(rolling_std(prices, 7)).all()
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("window", [7, 14])
+def test_volatility_stats_matches_pandas(dtype, window):
+    prices = with_gaps(random_walk()).astype(dtype)
+    ffill_inplace(prices)
+    series = pd.Series(prices.astype(np.float64))
+    volatility = series.pct_change().rolling(window).std() * math.sqrt(252)
+    expected_slope = np.polyfit(np.arange(window), series.iloc[-window:], 1)[0]
+    
+    current, average, slope = volatility_stats(prices, window)
+    
+    np.testing.assert_allclose(current, volatility.iloc[-1], rtol=1e-6)
+    np.testing.assert_allclose(average, volatility.mean(), rtol=1e-6)
+    np.testing.assert_allclose(slope, expected_slope, **TOLERANCES[dtype])
+
+
+def test_volatility_stats_short_history():
+    current, average, slope = volatility_stats(np.array([100.0, 102.0, 101.0]), 7)
+    
+    assert math.isnan(current) and math.isnan(average)
+    assert slope == pytest.approx(np.polyfit([0, 1, 2], [100.0, 102.0, 101.0], 1)[0])
+    
+    assert volatility_stats(np.array([100.0]), 7)[2] == 0.0
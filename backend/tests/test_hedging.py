@@ -0,0 +1,274 @@
+"""
+Tests for HedgingService bulk settlement and latest-price lookups
+MongoDB and Redis are replaced by small in-memory fakes
+"""
+
+import asyncio
+import warnings
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.models.contract import ContractStatus, ContractType
+from app.models.price import CommodityType
+from app.services import hedging
+from app.services.hedging import HedgingService
+
+
+class FakeCursor:
+    """Async-iterable stand-in for an aggregation cursor"""
+    
+    def __init__(self, docs):
+        self.docs = docs
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakePrices:
+    """Prices collection answering the latest-price aggregation"""
+    
+    def __init__(self, prices, delay: float = 0.01, error: Exception = None):
+        self.prices = prices
+        self.delay = delay
+        self.error = error
+        self.queries = []
+    
+    async def aggregate(self, pipeline):
+        commodities = pipeline[0]["$match"]["commodity"]["$in"]
+        self.queries.append(list(commodities))
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return FakeCursor([
+            {"_id": commodity, "price": self.prices[commodity]}
+            for commodity in commodities
+            if commodity in self.prices
+        ])
+
+
+class FakeContracts:
+    """Contracts collection recording bulk writes"""
+    
+    def __init__(self, modified_count: int = 0):
+        self.modified_count = modified_count
+        self.writes = []
+    
+    async def bulk_write(self, operations, ordered=True):
+        self.writes.append((operations, ordered))
+        return SimpleNamespace(modified_count=self.modified_count)
+
+
+class FakePipeline:
+    """Redis pipeline recording SETEX writes"""
+    
+    def __init__(self, redis):
+        self.redis = redis
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    def setex(self, key, ttl, value):
+        self.redis.writes[key] = value
+    
+    async def execute(self):
+        return []
+
+
+class FakeRedis:
+    """Redis client serving cached prices and recording cache writes"""
+    
+    def __init__(self, cached):
+        self.cached = cached
+        self.reads = 0
+        self.writes = {}
+    
+    async def mget(self, keys):
+        self.reads += 1
+        return [self.cached.get(key) for key in keys]
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+# Clock reading for settlement writes
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+class FrozenDatetime(datetime):
+    """datetime whose now() always returns NOW"""
+    
+    @classmethod
+    def now(cls, tz=None):
+        return NOW
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    fakes = {
+        "contracts": FakeContracts(),
+        "prices": FakePrices({"soybean": 4500.0, "mustard": 5600.0}),
+        "settlement_events": SimpleNamespace()
+    }
+    monkeypatch.setattr(hedging, "get_collection", lambda name: fakes[name])
+    monkeypatch.setattr(hedging, "get_redis", lambda: None)
+    monkeypatch.setattr(hedging, "_inflight_prices", {})
+    return fakes
+
+
+@pytest.fixture
+def service(collections):
+    return HedgingService()
+
+
+def contract(commodity: str, locked_price: float, quantity: float):
+    return {
+        "_id": ObjectId(),
+        "commodity": commodity,
+        "locked_price": locked_price,
+        "quantity": quantity
+    }
+
+
+@pytest.mark.asyncio
+async def test_settle_contracts_writes_active_contracts_in_one_bulk(
+    service, collections, monkeypatch
+):
+    monkeypatch.setattr(hedging, "datetime", FrozenDatetime)
+    contracts_collection = collections["contracts"]
+    contracts_collection.modified_count = 1
+    soybean = contract("soybean", 4000.0, 10)
+    unpriced = contract("groundnut", 6000.0, 5)
+    
+    settled = await service.settle_contracts([soybean, unpriced], {"soybean": 4500.0})
+    
+    assert settled == 1
+    assert contracts_collection.writes == [(
+        [UpdateOne(
+            {"_id": soybean["_id"], "status": ContractStatus.ACTIVE},
+            {"$set": {
+                "status": ContractStatus.SETTLED,
+                "actual_gain_loss": 5000.0,
+                "settled_at": NOW,
+                "updated_at": NOW
+            }}
+        )],
+        False
+    )]
+
+
+@pytest.mark.asyncio
+async def test_settle_contracts_without_prices_skips_the_write(service, collections):
+    settled = await service.settle_contracts([contract("soybean", 4000.0, 10)], {})
+    
+    assert settled == 0
+    assert collections["contracts"].writes == []
+
+
+@pytest.mark.asyncio
+async def test_concurrent_price_lookups_share_one_query(service, collections):
+    results = await asyncio.gather(*(
+        service.get_latest_prices(["soybean", "mustard"]) for _ in range(5)
+    ))
+    
+    assert collections["prices"].queries == [["soybean", "mustard"]]
+    assert all(result == {"soybean": 4500.0, "mustard": 5600.0} for result in results)
+    assert hedging._inflight_prices == {}
+
+
+@pytest.mark.asyncio
+async def test_price_lookup_errors_reach_every_waiter(service, collections):
+    collections["prices"].error = RuntimeError("primary stepped down")
+    
+    results = await asyncio.gather(
+        *(service.get_latest_prices(["soybean"]) for _ in range(3)),
+        return_exceptions=True
+    )
+    
+    assert len(collections["prices"].queries) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert hedging._inflight_prices == {}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_lets_waiters_query_themselves(service, collections):
+    leader = asyncio.create_task(service.get_latest_prices(["soybean"]))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(service.get_latest_prices(["soybean"]))
+    await asyncio.sleep(0)
+    
+    leader.cancel()
+    
+    assert await waiter == {"soybean": 4500.0}
+    assert leader.cancelled()
+    assert collections["prices"].queries == [["soybean"], ["soybean"]]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_shared_query_running(service, collections):
+    leader = asyncio.create_task(service.get_latest_prices(["soybean"]))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(service.get_latest_prices(["soybean"]))
+    await asyncio.sleep(0)
+    
+    waiter.cancel()
+    
+    assert await leader == {"soybean": 4500.0}
+    assert waiter.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_cached_prices_skip_the_query(service, collections, monkeypatch):
+    monkeypatch.setattr(hedging, "get_redis", lambda: FakeRedis({"price:soybean": b"4400"}))
+    
+    prices = await service.get_latest_prices(["soybean"])
+    
+    assert prices == {"soybean": 4400.0}
+    assert collections["prices"].queries == []
+
+
+@pytest.mark.asyncio
+async def test_uncached_lookup_queries_and_refreshes_the_cache(service, collections, monkeypatch):
+    redis = FakeRedis({"price:soybean": b"4400"})
+    monkeypatch.setattr(hedging, "get_redis", lambda: redis)
+    
+    prices = await service.get_latest_prices(["soybean"], use_cache=False)
+    
+    assert prices == {"soybean": 4500.0}
+    assert redis.reads == 0
+    assert collections["prices"].queries == [["soybean"]]
+    assert redis.writes == {"price:soybean": 4500.0}
+
+
+def test_stored_contract_keeps_enum_fields():
+    doc = {
+        "_id": str(ObjectId()),
+        "user_id": "farmer-1",
+        "commodity": "soybean",
+        "contract_type": "forward",
+        "quantity": 10.0,
+        "locked_price": 4000.0,
+        "settlement_date": NOW,
+        "status": "active",
+        "created_at": NOW,
+        "updated_at": NOW
+    }
+    
+    result = hedging._to_contract(doc)
+    
+    assert result.commodity is CommodityType.SOYBEAN
+    assert result.contract_type is ContractType.FORWARD
+    assert result.status is ContractStatus.ACTIVE
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result.model_dump_json()
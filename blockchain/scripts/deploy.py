@@ -4,15 +4,22 @@ Compiles and deploys the HedgingContract smart contract
 """
 
 from web3 import Web3
-from solcx import compile_standard, install_solc
+from solcx import compile_standard, install_solc, get_installed_solc_versions
+import hashlib
 import json
 import os
 from pathlib import Path
 from loguru import logger
 
+from http_session import create_http_session
 
-# Install Solidity compiler
-install_solc('0.8.19')
+
+# Solidity compiler version used to build the contract
+SOLC_VERSION = '0.8.19'
+
+# Install Solidity compiler (skipped when already installed)
+if SOLC_VERSION not in [str(v) for v in get_installed_solc_versions()]:
+    install_solc(SOLC_VERSION)
 
 
 def compile_contract():
@@ -25,26 +32,44 @@ def compile_contract():
     with open(contract_path, 'r') as f:
         contract_source = f.read()
     
-    # Compile the contract
-    compiled_sol = compile_standard(
-        {
-            "language": "Solidity",
-            "sources": {"HedgingContract.sol": {"content": contract_source}},
-            "settings": {
-                "outputSelection": {
-                    "*": {
-                        "*": ["abi", "metadata", "evm.bytecode", "evm.sourceMap"]
-                    }
+    compiler_input = {
+        "language": "Solidity",
+        "sources": {"HedgingContract.sol": {"content": contract_source}},
+        "settings": {
+            "outputSelection": {
+                "*": {
+                    "*": ["abi", "metadata", "evm.bytecode", "evm.sourceMap"]
                 }
-            },
+            }
         },
-        solc_version="0.8.19",
-    )
+    }
+    
+    # Key the build on everything that affects it: the compiler version
+    # and the full compiler input (source and settings)
+    build_hash = hashlib.sha256(
+        json.dumps(
+            {"solc_version": SOLC_VERSION, "input": compiler_input},
+            sort_keys=True
+        ).encode()
+    ).hexdigest()
+    compiled_path = Path(__file__).parent.parent / "build" / "HedgingContract.json"
+    
+    # Reuse the previous build if none of its inputs changed
+    if compiled_path.exists():
+        with open(compiled_path, 'r') as f:
+            compiled_sol = json.load(f)
+        
+        if compiled_sol.get("build_sha256") == build_hash:
+            logger.info("✅ Contract unchanged, using cached build")
+            return compiled_sol
+    
+    # Compile the contract
+    compiled_sol = compile_standard(compiler_input, solc_version=SOLC_VERSION)
     
     logger.info("✅ Contract compiled successfully!")
     
-    # Save compiled contract
-    compiled_path = Path(__file__).parent.parent / "build" / "HedgingContract.json"
+    # Save compiled contract, tagged with the inputs it was built from
+    compiled_sol["build_sha256"] = build_hash
     compiled_path.parent.mkdir(exist_ok=True)
     
     with open(compiled_path, 'w') as f:
@@ -115,7 +140,7 @@ def main():
     
     logger.info(f"🔌 Connecting to Ganache at {GANACHE_URL}...")
     
-    w3 = Web3(Web3.HTTPProvider(GANACHE_URL))
+    w3 = Web3(Web3.HTTPProvider(GANACHE_URL, session=create_http_session()))
     
     if not w3.is_connected():
         logger.error("❌ Failed to connect to Ganache. Make sure it's running!")
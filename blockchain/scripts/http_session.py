@@ -0,0 +1,18 @@
+"""
+Shared HTTP session for the JSON-RPC provider used by the scripts
+"""
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+
+def create_http_session() -> Session:
+    """
+    Create an HTTP session for the JSON-RPC provider
+    Connections are kept alive and reused instead of reopened per call
+    """
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=3)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -4,14 +4,22 @@ Tests all contract functions on Ganache
 """
 
 from web3 import Web3
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import json
 from pathlib import Path
 from loguru import logger
 import time
 
+from http_session import create_http_session
 
+
+@functools.lru_cache(maxsize=1)
 def load_contract():
-    """Load deployed contract"""
+    """
+    Load deployed contract
+    Cached, so every test shares one provider connection and contract object
+    """
     
     deployment_path = Path(__file__).parent.parent / "build" / "deployment.json"
     
@@ -23,7 +31,7 @@ def load_contract():
         deployment = json.load(f)
     
     # Connect to Ganache
-    w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+    w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545", session=create_http_session()))
     
     if not w3.is_connected():
         logger.error("❌ Cannot connect to Ganache!")
@@ -185,16 +193,20 @@ def run_all_tests():
     contract_id = test_create_contract()
     print()
     
+    # Tests 2-4 only need the contract created above and don't depend on
+    # each other, so their confirmations and calls are awaited in parallel
     # Test 2: Update price
-    test_update_price()
-    print()
-    
     # Test 3: Calculate gain/loss
-    test_calculate_gain_loss()
-    print()
-    
     # Test 4: Get farmer contracts
-    test_get_farmer_contracts()
+    independent_tests = [
+        test_update_price,
+        test_calculate_gain_loss,
+        test_get_farmer_contracts
+    ]
+    with ThreadPoolExecutor(max_workers=len(independent_tests)) as pool:
+        futures = [pool.submit(test) for test in independent_tests]
+        for future in futures:
+            future.result()
     print()
     
     # Test 5: Settle contract (will fail - not matured)